@@ -22,13 +22,55 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
+from importlib import import_module
+
 from .renamer import (
     get_files,
+    walk_files,
     renamed_files,
+    plan_renames,
+    rename_waves,
+    compose_history,
+    BatchResult,
     rename
 )
 from . import utils
 
+# the less used parts are only imported on first use, which keeps the startup of the
+# command-line tool fast
+_lazy = {
+    'compile_filter': 'filters',
+    'extension': 'filters',
+    'Journal': 'journal',
+    'write_plan': 'planfile',
+    'read_plan': 'planfile',
+    'Snapshot': 'snapshot',
+    'Listing': 'listing',
+    'natural_key': 'listing',
+    'Stats': 'stats',
+    'Reporter': 'report',
+    'Watcher': 'watch',
+    'Template': 'template',
+    'compile_template': 'template',
+    'hashed_files': 'hashing',
+    'HashCache': 'hashing',
+    'JobRunner': 'service',
+    'JobError': 'service',
+    'load_manifest': 'service',
+}
+
+def __getattr__(name):
+    try:
+        module = _lazy[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    value = getattr(import_module(f'.{module}', __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(list(globals()) + list(_lazy))
+
 __title__ = 'EZrename'
 __version__ = '0.5.0'
 __license__ = 'MIT'
@@ -23,8 +23,13 @@ SOFTWARE.
 """
 
 import os
+import re
 import sys
+import json
+import time
+import contextlib
 import argparse
+import datetime
 
 if __package__ == '' and not hasattr(sys, 'frozen'):
     # in case of running without -m
@@ -35,7 +40,10 @@ import EZrename
 
 def get_predicates(**flags):
     """Returns a list of predicates to be applied for get_file.
-    
+
+    The flags are compiled into a single predicate by EZrename.compile_filter, which
+    documents every flag.
+
     kwargs
     ------
     ignore : Sequence
@@ -47,32 +55,124 @@ def get_predicates(**flags):
         is provided then only ignore directories. Calling with only filters only directories
         and those extensions.
     """
-    get_ext = lambda filename: os.path.splitext(filename)[1][1:]
-    predicates = []
-
-    only = flags.get('only')
-    ignore = flags.get('ignore')
-    directory = flags.get('directory')
-
-    if directory:
-        if only:
-            # directory with only includes directories
-            predicates.append(lambda e: e.is_dir() or get_ext(e.name) in only)
-        elif ignore:
-            # directory with ignore ignores directories as well as the given extensions
-            predicates.append(lambda e: not e.is_dir() and not get_ext(e.name) in ignore)
-        elif not ignore and type(ignore) == list:
-            # calling -i without any args gives an empty list use this behaviour to ignore directories only
-            predicates.append(lambda e: not e.is_dir())
+    predicate = EZrename.compile_filter(**flags)
+    return [predicate] if predicate else []
+
+
+def size(value):
+    """Parses a size in bytes, optionally with a K, M or G suffix."""
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+    try:
+        if value[-1:].upper() in units:
+            return int(float(value[:-1]) * units[value[-1].upper()])
+        return int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size: '{value}'")
+
+
+def timestamp(value):
+    """Parses an ISO 8601 date, like 2021-01-31 or 2021-01-31T20:30, into a timestamp."""
+    try:
+        return datetime.datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date: '{value}'")
+
+
+@contextlib.contextmanager
+def reporting(args):
+    """Yields the EZrename.Reporter for the output options of args."""
+
+    with contextlib.ExitStack() as stack:
+        changes = None
+        if args.changes:
+            changes = stack.enter_context(open(args.changes, 'w', encoding='utf-8'))
+        elif args.report == 'list' and not args.quiet:
+            changes = sys.stdout
+        progress = sys.stderr if args.report == 'progress' and not args.quiet else None
+        with EZrename.Reporter(changes=changes, progress=progress, summary=args.report != 'list') as reporter:
+            yield reporter
+
+
+def run_batches(conf, path, batches, args, undo=False, stats=None, move=False, names=None, list_targets=True):
+    """Renames each source of batches under a journal and records it in the history of path.
+    Returns the (new_name: original) history of every batch. Renames can leave path with move,
+    names and list_targets say how collisions are looked up, see EZrename.rename."""
+
+    journal_file = conf.journal_path(path)
+    if os.path.exists(journal_file):
+        conf.errorer(f"A batch of rename in '{path}' was interrupted. Use rename --resume or --rollback first.")
+
+    results = []
+    with reporting(args) as reporter:
+        for source in batches:
+            if undo:
+                source = list(source)
+            journal = EZrename.Journal(journal_file, path, group_size=args.journal_group, undo=undo)
+            with journal:
+                result = EZrename.rename(
+                    source, jobs=args.jobs, journal=journal, stats=stats, move=move, names=names,
+                    list_targets=list_targets, **reporter.callbacks
+                )
+            record_batch(conf, path, journal, result, undo=undo, stats=stats)
+            results.append(result)
+            if undo and len(result) < len(source):
+                # older batches renamed what the kept renames still hold, so undoing stops here
+                print(f"{len(source) - len(result)} rename(s) couldn't be undone and were kept in the history.",
+                      file=sys.stderr)
+                break
+    return results
+
+
+def record_batch(conf, path, journal, result, undo=False, stats=None):
+    """Records a finished batch in the history of path and removes its journal."""
+
+    with stats.phase('history') if stats else contextlib.nullcontext():
+        # every undone rename is forgotten right away, an interruption only affects the current batch
+        if undo:
+            conf.history.drop_renames(path, result.values())
         else:
-            predicates.append(lambda e: e.is_dir())
-    else:
-        if ignore:
-            predicates.append(lambda e: not get_ext(e.name) in ignore)
-        if only:
-            predicates.append(lambda e: get_ext(e.name) in only)
+            conf.add_history(path, result)
+        journal.finish()
+    if stats:
+        stats.counts['history_entries'] += len(result)
+        if not undo:
+            # the absolute paths recorded, the store's own growth depends on how its pages happen to fill
+            stats.counts['history_bytes'] += sum(
+                len(os.fsencode(os.path.abspath(new_name))) + len(os.fsencode(os.path.abspath(original)))
+                for new_name, original in result.items()
+            )
+
+
+def watching(conf, path, regex, predicates, args):
+    """Renames the entries arriving in path, a batch at a time, until interrupted."""
+
+    # one template for every batch, so {n} keeps counting
+    template = EZrename.compile_template(args.replacewith)
+    with EZrename.Watcher(path, delay=args.watch_delay) as watcher:
+        if not args.quiet:
+            print(f"Watching '{path}'. Press Ctrl+C to stop.")
+        try:
+            for arrivals in watcher.batches():
+                if predicates:
+                    arrivals = filter(predicates[0], arrivals)
+                source = EZrename.renamed_files(path, arrivals, regex, template, dest=args.dest)
+                # a batch is a few arrivals in what may be a large directory, so it isn't listed
+                for result in run_batches(conf, path, [source], args, move=bool(args.dest), list_targets=False):
+                    if not args.dest:
+                        watcher.renamed(result)
+        except KeyboardInterrupt:
+            pass
+    conf.dump()
+
 
-    return predicates
+def algorithm(value):
+    """Checks value is a hashlib algorithm with a fixed size digest."""
+    import hashlib
+    try:
+        hashlib.new(value).hexdigest()
+    except (ValueError, TypeError):
+        raise argparse.ArgumentTypeError(f"unsupported hash algorithm: '{value}'")
+    return value
 
 
 def renaming(parser, args):
@@ -81,20 +181,126 @@ def renaming(parser, args):
     conf = args.confighandler
     phandler = EZrename.utils.PathHandler(invalids=3, sys_exit=True)
     path = phandler.input_validate(args.path)
-    predicates = get_predicates(only=args.only, ignore=args.ignore, directory=args.directory)
+    flags = dict(
+        only=args.only, ignore=args.ignore, directory=args.directory, glob=args.glob,
+        min_size=args.min_size, max_size=args.max_size, newer=args.newer, older=args.older,
+        min_length=args.min_length, max_length=args.max_length
+    )
+    predicates = get_predicates(**flags)
+    if args.dest:
+        if args.snapshot:
+            parser.error("-s/--snapshot can't be used with --dest.")
+        if args.recursive:
+            # the directories are recreated under dest as their files are moved
+            predicates.append(lambda entry: not entry.is_dir())
+        if args.jobs is None:
+            args.jobs = 4
+    stats = EZrename.Stats() if args.stats or args.stats_json else None
+
+    journal_file = conf.journal_path(path)
+
+    if args.watch and (args.undo or args.resume or args.rollback):
+        parser.error("-w/--watch can't be used with -u/--undo, --resume or --rollback.")
+
+    if args.resume or args.rollback:
+        if not os.path.exists(journal_file):
+            parser.error(f"No interrupted batch of rename in '{path}'.")
+        journal, finished, pending = EZrename.Journal.load(journal_file)
+        with reporting(args) as reporter:
+            if args.rollback:
+                EZrename.Journal.rollback(finished + pending, on_rename=reporter.on_rename)
+            elif journal.undo:
+                EZrename.Journal.resume(finished, pending, on_rename=reporter.on_rename)
+                conf.history.drop_batches(path)
+            else:
+                conf.add_history(path, EZrename.Journal.resume(finished, pending, on_rename=reporter.on_rename))
+        journal.finish()
+        conf.dump()
+        return
 
+    snapshot = None
+    hashcache = None
+    names = None
     if args.undo:
-        source = conf.get_history(path)
+        batches = conf.get_history(path, args.undo)
     else:
-        regex = conf.get_regex(regex=args.regex, preset_regex=args.preset_regex)
-        source = EZrename.renamed_files(path, EZrename.get_files(path, predicates), regex, args.replacewith)
-    if args.quiet:
-        on_rename_callback = lambda original, new_name: None
-        conf.history[path] = EZrename.rename(source, on_rename=on_rename_callback)
+        if args.hash_name and not (args.regex or args.preset_regex):
+            from EZrename.hashing import STEM_REGEX
+            regex = STEM_REGEX
+        else:
+            regex = conf.get_regex(regex=args.regex, preset_regex=args.preset_regex)
+        try:
+            # compiled matchers are cached, so this costs nothing later
+            EZrename.matching.compile_matcher(regex)
+        except re.error as err:
+            parser.error(f"Invalid regex: {err}.")
+        replacewith = args.replacewith or ('{hash}' if args.hash_name else '')
+        if 'hash' in EZrename.compile_template(replacewith).tokens and not args.hash_name:
+            parser.error("{hash} can only be used with --hash-name.")
+        if args.watch:
+            for option, used in (
+                ('--hash-name', args.hash_name), ('-p/--plan', args.plan), ('-R/--recursive', args.recursive),
+                ('--max-depth', args.max_depth is not None), ('-s/--snapshot', args.snapshot),
+                ('--scan-first', args.scan_first), ('--natural', args.natural)
+            ):
+                if used:
+                    parser.error(f"-w/--watch can't be used with {option}.")
+            watching(conf, path, regex, predicates, args)
+            return
+        if args.snapshot:
+            key = json.dumps([regex, replacewith, flags, args.max_depth, args.hash_name], sort_keys=True)
+            tokens = EZrename.compile_template(replacewith).tokens
+            if 'ctime' in tokens:
+                parser.error("-s/--snapshot can't be used with {ctime}, which changes without the contents.")
+            # whether an entry conforms depends on more than its name then
+            metadata = bool(
+                tokens & {'mtime', 'size', 'hash'} or args.hash_name
+                or any(flags[flag] is not None for flag in ('min_size', 'max_size', 'newer', 'older'))
+            )
+            snapshot = EZrename.Snapshot(os.path.join(conf.statedir, 'snapshot.sqlite3'), key, metadata=metadata)
+            # the mtime of a directory doesn't change with the contents of its subdirectories
+            if not args.recursive and snapshot.unchanged(path):
+                print("Nothing to rename.")
+                return
+        # collisions are checked against the names seen by the scan rather than listing again
+        names = {}
+        files = EZrename.get_files(
+            path, predicates, recursive=args.recursive, max_depth=args.max_depth, stats=stats,
+            listing=args.scan_first, natural=args.natural, names=names
+        )
+        if args.hash_name:
+            hashcache = EZrename.HashCache(os.path.join(conf.statedir, 'hashes.sqlite3'))
+            files = EZrename.hashed_files(files, args.hash_name, cache=hashcache, workers=args.hash_workers)
+        batches = [
+            EZrename.renamed_files(path, files, regex, replacewith, snapshot=snapshot, stats=stats, dest=args.dest)
+        ]
+
+    if args.plan:
+        if args.undo:
+            parser.error("-p/--plan can't be used with -u/--undo.")
+        with (contextlib.nullcontext(sys.stdout) if args.plan == '-' else open(args.plan, 'w', encoding='utf-8')) as fp:
+            count = EZrename.write_plan(fp, path, batches[0])
+        if args.plan != '-':
+            print(f"Planned {count} rename(s) into {args.plan}.")
     else:
-        conf.history[path] = EZrename.rename(source)
+        run_batches(
+            conf, path, batches, args, undo=bool(args.undo), stats=stats, move=bool(args.undo or args.dest), names=names
+        )
+
+    with stats.phase('dump') if stats else contextlib.nullcontext():
+        if snapshot:
+            snapshot.commit()
+            if not snapshot.changes and not args.recursive:
+                snapshot.mark(path)
+        if hashcache:
+            hashcache.commit()
+        conf.dump()
 
-    conf.dump()
+    if args.stats:
+        print(stats.summary())
+    if args.stats_json:
+        with (contextlib.nullcontext(sys.stdout) if args.stats_json == '-' else open(args.stats_json, 'w')) as fp:
+            json.dump(stats.as_dict(), fp, indent=4)
 
 
 def renamingparser(subparsers):
@@ -106,7 +312,8 @@ def renamingparser(subparsers):
     parser.add_argument('path', help="Path to target files and directories.")
     parser.add_argument('replacewith', nargs='?', default="",
                         help="Matched pattern are replaced with this." \
-                            " Providing none will remove the matched pattern.")
+                            " Providing none will remove the matched pattern. Can use the tokens {n}," \
+                            " {mtime}, {ctime}, {size} and {parent}, like {n:03d} or {mtime:%%Y%%m%%d}.")
 
     regexes = parser.add_mutually_exclusive_group()
     regexes.add_argument('-r', '--regex', help="Matches name pattern by this regex.")
@@ -118,9 +325,161 @@ def renamingparser(subparsers):
                         help="Matches directories. If called with -o/--only, matches only extenions and " \
                             "directories. If called with -i/--ignore, then ignores the extensions and directory." \
                             "If all three are called together, the ignore is ignored.")
-    
-    parser.add_argument('-u', '--undo', action='store_true', help="Undos the previous batch of rename.")
+    parser.add_argument('-g', '--glob', nargs='+', metavar='PATTERN',
+                        help="Only match names matching any of these shell-style patterns, like 'IMG_*'.")
+    parser.add_argument('--min-size', type=size, metavar='SIZE', help="Only match at least this big, like 10M.")
+    parser.add_argument('--max-size', type=size, metavar='SIZE', help="Only match at most this big, like 1.5G.")
+    parser.add_argument('--newer', type=timestamp, metavar='DATE',
+                        help="Only match modified at or after this date, like 2021-01-31 or 2021-01-31T20:30.")
+    parser.add_argument('--older', type=timestamp, metavar='DATE', help="Only match modified at or before this date.")
+    parser.add_argument('--min-length', type=int, metavar='N', help="Only match names at least N characters long.")
+    parser.add_argument('--max-length', type=int, metavar='N', help="Only match names at most N characters long.")
+    parser.add_argument('-R', '--recursive', action='store_true',
+                        help="Also renames inside subdirectories. Contents are renamed before their directory.")
+    parser.add_argument('--max-depth', type=int, metavar='N',
+                        help="How many levels of subdirectories -R/--recursive descends into.")
+
+    parser.add_argument('--scan-first', action='store_true',
+                        help="Reads each directory completely into a compact listing before renaming any of it.")
+    parser.add_argument('--natural', action='store_true',
+                        help="Renames in natural order, file2 before file10, so {n} numbers deterministically." \
+                            " Implies --scan-first.")
+    parser.add_argument('--dest', metavar='DIR',
+                        help="Moves the files into DIR as they're renamed, copying them if it's on another device." \
+                            " -R/--recursive recreates the subdirectories there. Moves 4 files at once unless -j/--jobs says otherwise.")
+    parser.add_argument('-s', '--snapshot', action='store_true',
+                        help="Remembers what already conforms, so repeated runs skip it without matching again.")
+    parser.add_argument('-j', '--jobs', type=int, metavar='N',
+                        help="Runs up to N independent renames at once. Helps on network filesystems.")
+    parser.add_argument('-p', '--plan', metavar='FILE',
+                        help="Writes the renames into a plan file, '-' for stdout, instead of renaming." \
+                            " Carry it out later with apply.")
+    parser.add_argument('--hash-name', nargs='?', const='sha256', type=algorithm, metavar='ALGORITHM',
+                        help="Renames files to the digest of their contents, sha256 if ALGORITHM isn't provided." \
+                            " Keeps the extension, unless a regex is given, then {hash} can be used in replacewith.")
+    parser.add_argument('--hash-workers', type=int, metavar='N',
+                        help="Number of processes hashing for --hash-name. Defaults to the number of CPUs.")
+    parser.add_argument('-w', '--watch', action='store_true',
+                        help="Keeps renaming the entries arriving in path, instead of the ones already there.")
+    parser.add_argument('--watch-delay', type=float, default=0.5, metavar='SECONDS',
+                        help="How long -w/--watch waits for more arrivals before renaming them. Defaults to 0.5.")
+    parser.add_argument('-u', '--undo', nargs='?', type=int, const=1, metavar='N',
+                        help="Undos the previous N batches of rename, 1 if N isn't provided.")
+    parser.add_argument('--resume', action='store_true',
+                        help="Finishes a batch of rename that was interrupted, from its journal.")
+    parser.add_argument('--rollback', action='store_true',
+                        help="Reverses a batch of rename that was interrupted, from its journal.")
+    parser.add_argument('--journal-group', type=int, default=1000, metavar='N',
+                        help="Number of renames written to the journal at once. Defaults to 1000.")
+    parser.add_argument('-q', '--quiet', action='store_true', help="Doesn't display the changes.")
+    parser.add_argument('--report', choices=['list', 'progress', 'summary'], default='list',
+                        help="Lists the changes, shows a progress line or only a summary. Defaults to list.")
+    parser.add_argument('--changes', metavar='FILE', help="Writes the list of changes into FILE instead.")
+    parser.add_argument('--stats', action='store_true',
+                        help="Shows the time spent in every phase, counts and a rename latency histogram.")
+    parser.add_argument('--stats-json', metavar='FILE', help="Writes the --stats as json into FILE, '-' for stdout.")
+    parser.add_argument('--profile', metavar='FILE', help="Writes a cProfile capture of the run into FILE.")
+
+
+def applying(parser, args):
+    """The function behind {apply} subparser."""
+
+    conf = args.confighandler
+    try:
+        with (contextlib.nullcontext(sys.stdin) if args.planfile == '-' else open(args.planfile, encoding='utf-8')) as fp:
+            path, source = EZrename.read_plan(fp)
+            run_batches(conf, path, [source], args, move=True)
+    except (OSError, ValueError) as err:
+        parser.error(f"Can't apply {args.planfile}: {err}")
+    conf.dump()
+
+
+def applyparser(subparsers):
+    """The apply subparser setup."""
+
+    parser = subparsers.add_parser('apply', help="Carrying out a plan file written by rename -p/--plan.")
+    parser.set_defaults(func=applying)
+    parser.add_argument('planfile', help="The plan file, '-' for stdin.")
+    parser.add_argument('-j', '--jobs', type=int, metavar='N', help="Runs up to N independent renames at once.")
+    parser.add_argument('--journal-group', type=int, default=1000, metavar='N',
+                        help="Number of renames written to the journal at once. Defaults to 1000.")
     parser.add_argument('-q', '--quiet', action='store_true', help="Doesn't display the changes.")
+    parser.add_argument('--report', choices=['list', 'progress', 'summary'], default='list',
+                        help="Lists the changes, shows a progress line or only a summary. Defaults to list.")
+    parser.add_argument('--changes', metavar='FILE', help="Writes the list of changes into FILE instead.")
+
+
+def serving(parser, args):
+    """The function behind {serve} subparser."""
+
+    runner = EZrename.JobRunner(args.confighandler)
+    try:
+        if args.socket:
+            runner.serve_socket(args.socket)
+        else:
+            runner.serve_lines(sys.stdin, sys.stdout)
+    except KeyboardInterrupt:
+        pass
+
+
+def serveparser(subparsers):
+    """The serve subparser setup."""
+
+    parser = subparsers.add_parser(
+        'serve', help="Running rename jobs, one json object per line, in a single long-running process."
+    )
+    parser.set_defaults(func=serving)
+    parser.add_argument('-s', '--socket', metavar='PATH',
+                        help="Listens on this Unix socket instead of reading jobs from stdin.")
+
+
+def batching(parser, args):
+    """The function behind {batch} subparser."""
+
+    runner = EZrename.JobRunner(args.confighandler)
+    try:
+        jobs = EZrename.load_manifest(args.manifest)
+    except (OSError, EZrename.JobError) as err:
+        parser.error(str(err))
+    if args.jobs:
+        jobs = [{'jobs': args.jobs, **job} for job in jobs]
+
+    start = time.perf_counter()
+    renamed = failed = errors = 0
+    try:
+        for result in runner.run_many(jobs, workers=args.workers):
+            renamed += result['renamed']
+            errors += len(result['errors'])
+            for error in result['errors']:
+                print(error, file=sys.stderr)
+            if 'error' in result:
+                failed += 1
+                print(f"{result['path']}: {result['error']}", file=sys.stderr)
+            elif args.report == 'list':
+                print(f"{result['path']}: {result['renamed']} renamed")
+    except KeyboardInterrupt:
+        print("Interrupted: the journals of unfinished jobs are kept for rename --resume or --rollback.",
+              file=sys.stderr)
+    print(f"{len(jobs)} job(s), {renamed} renamed, {failed} failed, {errors} error(s) "
+          f"in {time.perf_counter() - start:.2f}s")
+    if failed:
+        parser.exit(1)
+
+
+def batchparser(subparsers):
+    """The batch subparser setup."""
+
+    parser = subparsers.add_parser(
+        'batch', help="Running the rename jobs of a manifest on a pool of processes."
+    )
+    parser.set_defaults(func=batching)
+    parser.add_argument('manifest', help="A .toml manifest of [[job]] tables, or a json object per line.")
+    parser.add_argument('-w', '--workers', type=int, metavar='N',
+                        help="The number of processes. Defaults to the number of CPUs.")
+    parser.add_argument('-j', '--jobs', type=int, metavar='N',
+                        help="The number of threads renaming within each job, unless the job sets jobs.")
+    parser.add_argument('--report', choices=['list', 'summary'], default='list',
+                        help="Lists the renames of every job or only the summary. Defaults to list.")
 
 
 def configuring(parser, args):
@@ -181,6 +540,32 @@ def configparser(subparsers):
                             " Remove the default preset by 'default'.")
 
 
+def historying(parser, args):
+    """The function behind {history} subparser."""
+
+    conf = args.confighandler
+
+    if args.original:
+        for filepath in args.original:
+            print(f"{filepath}: {conf.history.original_name(filepath)}")
+    elif args.path:
+        for batch, created, renames in conf.history.list_batches(args.path):
+            created = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(created)) if created else "-"
+            print(f"{batch}: {created}, {renames} rename(s)")
+    else:
+        parser.error("Provide a path or -o/--original.")
+
+
+def historyparser(subparsers):
+    """The history subparser setup."""
+
+    parser = subparsers.add_parser('history', help="Looking up the rename history.")
+    parser.set_defaults(func=historying)
+    parser.add_argument('path', nargs='?', help="Lists the batches of rename in this path, latest first.")
+    parser.add_argument('-o', '--original', nargs='+', metavar='FILE',
+                        help="Shows what the file(s) were originally called, as their full path.")
+
+
 def parserdefault(parser, args):
     """The function behind default parser."""
 
@@ -198,11 +583,18 @@ def setparser():
     )
     parser.add_argument('-v', '--version', action='store_true', help="Shows the version.")
     parser.add_argument('-a', '--about', required=False, action='store_true', help="About this.")
+    parser.add_argument('--state-dir', metavar='DIR',
+                        help="Keeps the configuration, history and journals in DIR instead of next to the package." \
+                            " Defaults to the EZRENAME_STATE_DIR environment variable.")
     parser.set_defaults(func=parserdefault)
 
     subparsers = parser.add_subparsers()
     renamingparser(subparsers)
+    applyparser(subparsers)
+    serveparser(subparsers)
+    batchparser(subparsers)
     configparser(subparsers)
+    historyparser(subparsers)
 
     return parser, parser.parse_args()
 
@@ -210,8 +602,24 @@ def setparser():
 def main():
     parser, args = setparser()
     config_path = os.path.join(os.path.dirname(__file__), 'config.json')
-    args.confighandler = EZrename.utils.ConfigHandler(config_path, limit=5, errorer=parser.error)
-    args.func(parser, args)
+    statedir = args.state_dir or os.environ.get('EZRENAME_STATE_DIR')
+    if statedir:
+        # the configuration moves there too, starting from the one shipped with the package
+        os.makedirs(statedir, exist_ok=True)
+        args.confighandler = EZrename.utils.ConfigHandler(
+            os.path.join(statedir, 'config.json'), defaults=config_path, limit=5, errorer=parser.error
+        )
+    else:
+        args.confighandler = EZrename.utils.ConfigHandler(config_path, limit=5, errorer=parser.error)
+    if getattr(args, 'profile', None):
+        import cProfile
+        profiler = cProfile.Profile()
+        try:
+            profiler.runcall(args.func, parser, args)
+        finally:
+            profiler.dump_stats(args.profile)
+    else:
+        args.func(parser, args)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,206 @@
+"""
+MIT License
+
+Copyright (c) 2020-2021 Euphyzr
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import os
+import asyncio
+import functools
+from itertools import islice
+
+from . import renamer
+from .template import compile_template
+from .matching import compile_matcher
+
+def _take(iterator, count):
+    return list(islice(iterator, count))
+
+class Pipeline:
+    """Renames a directory as an asyncio pipeline of scanning, transforming and renaming.
+
+    The stages run concurrently and pass chunks of entries through bounded queues, so a
+    slow stage holds back the ones before it instead of piling up memory. Scanning and
+    renaming run on an executor, leaving the event loop free. Directories are read whole
+    into an EZrename.listing.Listing before anything in them is renamed, and every chunk is
+    planned with EZrename.plan_renames once the chunks before it are renamed, so nothing
+    gets renamed twice or overwritten.
+
+    Iterating over the pipeline runs it, yielding (original, new_name) of every rename.
+    If it's cancelled, the renames already running are waited for, so history always
+    holds every rename which happened.
+
+    Attributes
+    ----------
+    path : str
+        The directory to rename in.
+    regex : str
+        The pattern replaced in the names.
+    replace_with : str, optional
+        The replacement of the pattern.
+    predicates : list, optional
+        Predicates of get_files.
+    recursive : bool, optional
+        Also renames inside subdirectories, see EZrename.walk_files.
+    max_depth : int, optional
+        Maximum depth of a recursive scan.
+    jobs : int, optional
+        Number of renames of a chunk run concurrently, see EZrename.rename.
+    journal : EZrename.journal.Journal, optional
+        An open journal every chunk is recorded in.
+    chunk_size : int, optional
+        Number of entries passed between the stages at once. 256 by default.
+    queue_size : int, optional
+        Number of chunks a stage may be ahead of the next one. 4 by default.
+    executor : concurrent.futures.Executor, optional
+        Where scanning and renaming run. The loop's default executor if not provided.
+    history : EZrename.BatchResult, attribute
+        The (new_name: original) history of the renames carried out so far.
+    errors : list, attribute
+        The PermissionErrors of the renames which were skipped.
+    """
+
+    def __init__(
+        self, path, regex, replace_with='', predicates=None, recursive=False, max_depth=None,
+        jobs=None, journal=None, chunk_size=256, queue_size=4, executor=None
+    ):
+        self.path = path
+        self.regex = regex
+        self.replace_with = replace_with
+        self.predicates = predicates
+        self.recursive = recursive
+        self.max_depth = max_depth
+        self.jobs = jobs
+        self.journal = journal
+        self.chunk_size = chunk_size
+        self.queue_size = queue_size
+        self.executor = executor
+        self.history = renamer.BatchResult(base=path)
+        self.errors = []
+        # the names of the scanned directories, kept up to date as chunks are renamed, so planning
+        # a chunk doesn't list its directory again
+        self._names = {}
+
+    async def _scan(self, loop, output):
+        # every directory is read whole before its first chunk goes on, a live scan would
+        # come across the entries renamed by earlier chunks and rename them again
+        files = renamer.get_files(
+            self.path, self.predicates, recursive=self.recursive, max_depth=self.max_depth, listing=True,
+            names=self._names
+        )
+        try:
+            while True:
+                entries = await loop.run_in_executor(self.executor, _take, files, self.chunk_size)
+                if not entries:
+                    break
+                await output.put(entries)
+        finally:
+            await loop.run_in_executor(self.executor, files.close)
+        await output.put(None)
+
+    async def _transform(self, source, output):
+        pattern = compile_matcher(self.regex)
+        # shared by every chunk, so {n} keeps counting
+        template = compile_template(self.replace_with)
+        while (entries := await source.get()) is not None:
+            pairs = list(renamer.renamed_files(self.path, entries, pattern, template))
+            if pairs:
+                await output.put(pairs)
+        await output.put(None)
+
+    async def _rename(self, loop, source, output):
+        run = functools.partial(
+            renamer.rename, on_rename=lambda original, new_name: None,
+            on_permission_error=self.errors.append, jobs=self.jobs, journal=self.journal, names=self._names
+        )
+        while (pairs := await source.get()) is not None:
+            future = loop.run_in_executor(self.executor, run, pairs)
+            try:
+                history = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # the renames can't be stopped halfway, wait for them to keep history right
+                self.history.update(await future)
+                raise
+            self.history.update(history)
+            self._renamed(history)
+            for new_name, original in history.items():
+                await output.put((original, new_name))
+        await output.put(None)
+
+    def _renamed(self, history):
+        for new_name, original in history.items():
+            directory, name = os.path.split(original)
+            if directory in self._names:
+                self._names[directory].discard(name)
+            directory, name = os.path.split(new_name)
+            if directory in self._names:
+                self._names[directory].add(name)
+
+    def __aiter__(self):
+        return self._results()
+
+    async def _results(self):
+        loop = asyncio.get_running_loop()
+        entries = asyncio.Queue(self.queue_size)
+        pairs = asyncio.Queue(self.queue_size)
+        # results are single renames rather than chunks
+        results = asyncio.Queue(self.queue_size * self.chunk_size)
+        stages = [
+            asyncio.ensure_future(stage) for stage in
+            (self._scan(loop, entries), self._transform(entries, pairs), self._rename(loop, pairs, results))
+        ]
+        getter = None
+        try:
+            while True:
+                if getter is None:
+                    getter = asyncio.ensure_future(results.get())
+                running = [stage for stage in stages if not stage.done()]
+                await asyncio.wait((getter, *running), return_when=asyncio.FIRST_COMPLETED)
+                for stage in stages:
+                    if stage.done() and not stage.cancelled() and stage.exception():
+                        raise stage.exception()
+                if not getter.done():
+                    # a stage finished, the result is still on its way
+                    continue
+                result, getter = getter.result(), None
+                if result is None:
+                    break
+                yield result
+        finally:
+            # a failed stage leaves the others waiting on their queues, they all have to go
+            if getter is not None:
+                getter.cancel()
+            for stage in stages:
+                stage.cancel()
+            await asyncio.gather(*stages, return_exceptions=True)
+
+    async def run(self):
+        """Runs the whole pipeline. Returns its history."""
+        async for _ in self:
+            pass
+        return self.history
+
+
+async def rename(path, regex, replace_with='', **options):
+    """Renames in path through a Pipeline, see its attributes for options. Returns the
+    (new_name: original) history of the renames."""
+    return await Pipeline(path, regex, replace_with, **options).run()
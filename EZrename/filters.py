@@ -0,0 +1,112 @@
+"""
+MIT License
+
+Copyright (c) 2020-2021 Euphyzr
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import re
+import fnmatch
+
+def extension(name):
+    """Returns the extension of name without the dot, the same as os.path.splitext would."""
+    # leading dots belong to the name, like in .bashrc
+    stripped = name.lstrip('.')
+    dot = stripped.rfind('.')
+    return stripped[dot + 1:] if dot != -1 else ''
+
+def compile_filter(
+    only=None, ignore=None, directory=False, glob=None,
+    min_size=None, max_size=None, newer=None, older=None, min_length=None, max_length=None
+):
+    """Compiles the filtering flags into a single predicate taking an os.DirEntry. Returns None
+    if nothing is filtered.
+
+    Name based checks run first. The entry type comes from DirEntry's cached d_type and
+    stat() is only called, once, if a size or modification time filter is given.
+
+    only : Iterable[str]
+        Only accepts file extensions in this iterable.
+    ignore : Iterable[str]
+        Ignores file extensions in this iterable.
+    directory : bool
+        Calling with ignore, ignores the extensions and directories. If no extension
+        is provided then only ignore directories. Calling with only filters only directories
+        and those extensions. Alone it only accepts directories.
+    glob : Iterable[str]
+        Only accepts names matching any of these shell-style patterns.
+    min_size, max_size : int
+        Bounds of the size in bytes.
+    newer, older : float
+        Bounds of the modification time as a timestamp.
+    min_length, max_length : int
+        Bounds of the length of the name.
+    """
+    # an empty ignore still means something together with directory, so keep it apart from None
+    only = frozenset(only) if only else None
+    ignore_dirs = directory and ignore is not None and not only
+    ignore = frozenset(ignore) if ignore else None
+    match_name = re.compile('|'.join(fnmatch.translate(pattern) for pattern in glob)).match if glob else None
+    needs_stat = any(bound is not None for bound in (min_size, max_size, newer, older))
+
+    if not (only or ignore or directory or match_name or needs_stat) and min_length is None and max_length is None:
+        return None
+
+    def predicate(entry):
+        name = entry.name
+        if min_length is not None and len(name) < min_length:
+            return False
+        if max_length is not None and len(name) > max_length:
+            return False
+        if match_name is not None and not match_name(name):
+            return False
+
+        if directory:
+            if only:
+                # directory with only includes directories
+                if not entry.is_dir() and extension(name) not in only:
+                    return False
+            elif ignore_dirs:
+                # directory with ignore ignores directories as well as the given extensions,
+                # calling -i without any args gives an empty ignore to ignore directories only
+                if entry.is_dir() or (ignore and extension(name) in ignore):
+                    return False
+            elif not entry.is_dir():
+                return False
+        elif only or ignore:
+            ext = extension(name)
+            if (ignore and ext in ignore) or (only and ext not in only):
+                return False
+
+        if needs_stat:
+            stat = entry.stat()
+            if min_size is not None and stat.st_size < min_size:
+                return False
+            if max_size is not None and stat.st_size > max_size:
+                return False
+            if newer is not None and stat.st_mtime < newer:
+                return False
+            if older is not None and stat.st_mtime > older:
+                return False
+
+        return True
+
+    return predicate
@@ -0,0 +1,198 @@
+"""
+MIT License
+
+Copyright (c) 2020-2021 Euphyzr
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import os
+import hashlib
+from collections import deque
+
+CHUNK_SIZE = 1 << 20
+MMAP_THRESHOLD = 64 << 20
+# enough work per submission to outweigh handing it to another process
+BATCH_FILES = 64
+BATCH_BYTES = 256 << 20
+
+# names of --hash-name, the stem is replaced and the extension kept
+STEM_REGEX = r'^.+?(?=\.[^.]*$|$)'
+
+def hash_file(path, algorithm='sha256'):
+    """Returns the hex digest of a file. Large files are mapped into memory, others read in big chunks."""
+    digest = hashlib.new(algorithm)
+    with open(path, 'rb') as fp:
+        if os.fstat(fp.fileno()).st_size >= MMAP_THRESHOLD:
+            import mmap
+            with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                digest.update(view)
+        else:
+            while chunk := fp.read(CHUNK_SIZE):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+def _hash_files(paths, algorithm):
+    """Returns the digest of every path, None for the ones which can't be read."""
+    digests = []
+    for path in paths:
+        try:
+            digests.append(hash_file(path, algorithm))
+        except OSError:
+            digests.append(None)
+    return digests
+
+
+class HashCache:
+    """An on-disk cache of file digests, keyed by (dev, inode, size, mtime_ns) of the file.
+
+    A file keeping all four hasn't been written to, so its digest can be reused without reading it.
+
+    Attributes
+    ----------
+    dbfile : str
+        The path to the database file.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS digests (
+            algorithm TEXT NOT NULL,
+            dev INTEGER NOT NULL,
+            inode INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            digest TEXT NOT NULL,
+            PRIMARY KEY (algorithm, dev, inode)
+        );
+    """
+
+    def __init__(self, dbfile):
+        import sqlite3
+
+        self.dbfile = dbfile
+        self.connection = sqlite3.connect(dbfile, timeout=60)
+        self.connection.executescript(self.SCHEMA)
+        self.pending = []
+
+    def get(self, algorithm, stat):
+        """Returns the cached digest of a file by its stat, None if it isn't cached or changed since."""
+        row = self.connection.execute(
+            "SELECT digest FROM digests WHERE algorithm = ? AND dev = ? AND inode = ? AND size = ? AND mtime_ns = ?",
+            (algorithm, stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        ).fetchone()
+        return row[0] if row else None
+
+    def add(self, algorithm, stat, digest):
+        """Caches the digest of a file, written on commit."""
+        self.pending.append((algorithm, stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns, digest))
+
+    def commit(self):
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?, ?, ?)", self.pending)
+        self.pending = []
+
+    def close(self):
+        self.connection.close()
+
+
+class Hashed:
+    """An os.DirEntry along with the digest of its contents, for the {hash} token of templates."""
+
+    __slots__ = ('entry', 'digest', 'name', 'path')
+
+    def __init__(self, entry, digest):
+        self.entry = entry
+        self.digest = digest
+        self.name = entry.name
+        self.path = entry.path
+
+    def __getattr__(self, name):
+        return getattr(self.entry, name)
+
+
+def hashed_files(files, algorithm='sha256', cache=None, workers=None):
+    """Yields every file of files as Hashed, in order. Directories and unreadable files are left out.
+
+    Files are hashed on a process pool, a batch of them per task, while files found in
+    the cache aren't read at all. Only a couple of batches per worker are in flight at
+    a time, so files can keep streaming in from the scan.
+
+    algorithm : str [Optional]
+        Any algorithm of hashlib, like sha256 or blake2b.
+    cache : HashCache [Optional]
+        Where digests are looked up and recorded. Commit it afterwards.
+    workers : int [Optional]
+        Number of processes. Defaults to the number of CPUs.
+    """
+    hashlib.new(algorithm)  # fails early on an unknown algorithm
+    workers = workers or os.cpu_count() or 1
+    executor = None
+    waiting = deque()
+    batch, batch_files, batch_bytes = [], 0, 0
+
+    def submit():
+        nonlocal executor, batch, batch_files, batch_bytes
+        future = None
+        if batch_files:
+            if executor is None:
+                from concurrent.futures import ProcessPoolExecutor
+                executor = ProcessPoolExecutor(max_workers=workers)
+            paths = [entry.path for entry, stat, digest in batch if digest is None]
+            future = executor.submit(_hash_files, paths, algorithm)
+        waiting.append((batch, future))
+        batch, batch_files, batch_bytes = [], 0, 0
+
+    def finish():
+        items, future = waiting.popleft()
+        digests = iter(future.result() if future else ())
+        for entry, stat, digest in items:
+            if digest is None:
+                digest = next(digests)
+                if digest is None:
+                    continue
+                if cache:
+                    cache.add(algorithm, stat, digest)
+            yield Hashed(entry, digest)
+
+    try:
+        for entry in files:
+            if entry.is_dir():
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                # like a dangling symlink, there's nothing to read
+                continue
+            digest = cache.get(algorithm, stat) if cache else None
+            # cached files go in the batch as well, to keep their place in the order
+            batch.append((entry, stat, digest))
+            if digest is None:
+                batch_files += 1
+                batch_bytes += stat.st_size
+            if batch_files >= BATCH_FILES or batch_bytes >= BATCH_BYTES or len(batch) >= BATCH_FILES * 16:
+                submit()
+                while waiting and (len(waiting) > 2 * workers or not waiting[0][1] or waiting[0][1].done()):
+                    yield from finish()
+        submit()
+        while waiting:
+            yield from finish()
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
@@ -0,0 +1,159 @@
+"""
+MIT License
+
+Copyright (c) 2020-2021 Euphyzr
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import os
+import json
+
+from .renamer import compose_history
+from .mover import move
+
+class Journal:
+    """A write-ahead journal of a batch of renames.
+
+    Every group of renames is appended to the journal and synced to disk before any
+    of them is carried out, and marked as done afterwards. A batch which got interrupted
+    can then be resumed or rolled back from the journal. Syncing once per group instead
+    of once per rename keeps the cost of the journal low.
+
+    Attributes
+    ----------
+    journalfile : str
+        The path to the journal file.
+    path : str
+        The directory the batch renames in.
+    group_size : int, optional
+        Number of renames recorded per sync. 1000 by default.
+    undo : bool, optional
+        If the batch undoes an earlier batch of the history.
+    """
+
+    def __init__(self, journalfile, path, group_size=1000, undo=False):
+        self.journalfile = journalfile
+        self.path = path
+        self.group_size = group_size
+        self.undo = undo
+        self.file = None
+        self.recorded = False
+
+    def open(self):
+        """Starts the journal of a new batch."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.journalfile)), exist_ok=True)
+        self.file = open(self.journalfile, 'x', encoding='utf-8')
+        self._write({'path': self.path, 'undo': self.undo})
+        return self
+
+    def _write(self, *lines):
+        self.file.writelines(json.dumps(line) + '\n' for line in lines)
+        self.file.flush()
+
+    def record(self, steps):
+        """Appends a group of (original, new_name) steps and syncs them to disk."""
+        self._write(*steps)
+        os.fsync(self.file.fileno())
+        self.recorded = True
+
+    def amend(self, original, new_name):
+        """Notes that original ended up with a different name than recorded."""
+        self._write({'amend': [original, new_name]})
+
+    def failed(self, original):
+        """Notes that original couldn't be renamed."""
+        self._write({'failed': original})
+
+    def done(self):
+        """Marks every recorded step as carried out. Synced along with the next group."""
+        self._write({'done': True})
+
+    def finish(self):
+        """Closes and removes the journal, once the batch has been recorded in the history."""
+        self.close()
+        os.remove(self.journalfile)
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        # an interrupted batch keeps its journal for resume or rollback, unless it failed
+        # before renaming anything, like on a bad regex, and there's nothing to resume
+        self.close()
+        if exc_type is not None and not self.recorded:
+            os.remove(self.journalfile)
+
+    @classmethod
+    def load(cls, journalfile):
+        """Returns the journal of an interrupted batch, the steps which were marked as done
+        and the steps which were recorded after that."""
+        with open(journalfile, encoding='utf-8') as jfp:
+            header = json.loads(jfp.readline())
+            journal = cls(journalfile, header['path'], undo=header.get('undo', False))
+            finished, pending = [], []
+            for line in jfp:
+                try:
+                    line = json.loads(line)
+                except ValueError:
+                    # the last line may have been cut off by the interruption
+                    break
+                if isinstance(line, list):
+                    pending.append(tuple(line))
+                elif 'done' in line:
+                    finished.extend(pending)
+                    pending = []
+                else:
+                    original, *new_name = line.get('amend') or [line['failed']]
+                    steps = pending if any(step[0] == original for step in pending) else finished
+                    index = max(i for i, step in enumerate(steps) if step[0] == original)
+                    if new_name:
+                        steps[index] = (original, new_name[0])
+                    else:
+                        del steps[index]
+        return journal, finished, pending
+
+    @staticmethod
+    def resume(finished, pending, on_rename=lambda original, new_name: None):
+        """Carries out the pending steps which haven't happened yet. Returns the (new_name: original)
+        history of the whole batch."""
+        done = list(finished)
+        for original, new_name in pending:
+            if os.path.lexists(original) and not os.path.lexists(new_name):
+                try:
+                    move(original, new_name)
+                except OSError:
+                    continue
+                on_rename(original, new_name)
+            done.append((original, new_name))
+        return compose_history(done)
+
+    @staticmethod
+    def rollback(steps, on_rename=lambda original, new_name: None):
+        """Reverses the steps which have happened, latest first."""
+        for original, new_name in reversed(steps):
+            if os.path.lexists(new_name) and not os.path.lexists(original):
+                move(new_name, original)
+                on_rename(new_name, original)
@@ -0,0 +1,199 @@
+"""
+MIT License
+
+Copyright (c) 2020-2021 Euphyzr
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import os
+import re
+import sys
+import stat
+from array import array
+from collections.abc import Sequence
+
+_ENCODING = sys.getfilesystemencoding()
+_ERRORS = sys.getfilesystemencodeerrors()
+
+DIR, FILE, SYMLINK = 1, 2, 4
+
+_DIGITS = re.compile(r'(\d+)')
+
+def natural_key(name):
+    """Returns the sorting key of name, comparing its runs of digits as numbers so that
+    file2 comes before file10. Letters are compared without case, then the name itself."""
+    parts = _DIGITS.split(name.casefold())
+    parts[1::2] = map(int, parts[1::2])
+    return parts, name
+
+class ListedEntry:
+    """An entry of a Listing, standing in for os.DirEntry.
+
+    Its type and inode come from the scan, only stat touches the disk and it's
+    cached like os.DirEntry.stat is.
+
+    Attributes
+    ----------
+    name : str
+        The name of the entry.
+    path : str
+        The path of the entry, joined the way os.scandir joins it.
+    """
+
+    __slots__ = ('name', 'path', '_type', '_inode', '_stat', '_lstat')
+
+    def __init__(self, name, path, type, inode):
+        self.name = name
+        self.path = path
+        self._type = type
+        self._inode = inode
+        self._stat = self._lstat = None
+
+    def inode(self):
+        return self._inode
+
+    def is_symlink(self):
+        return bool(self._type & SYMLINK)
+
+    def is_dir(self, *, follow_symlinks=True):
+        if follow_symlinks and self._type & SYMLINK:
+            try:
+                return stat.S_ISDIR(self.stat().st_mode)
+            except OSError:
+                return False
+        return bool(self._type & DIR)
+
+    def is_file(self, *, follow_symlinks=True):
+        if follow_symlinks and self._type & SYMLINK:
+            try:
+                return stat.S_ISREG(self.stat().st_mode)
+            except OSError:
+                return False
+        return bool(self._type & FILE)
+
+    def stat(self, *, follow_symlinks=True):
+        if follow_symlinks and self._type & SYMLINK:
+            if self._stat is None:
+                self._stat = os.stat(self.path)
+            return self._stat
+        if self._lstat is None:
+            self._lstat = os.stat(self.path, follow_symlinks=False)
+        return self._lstat
+
+    def __fspath__(self):
+        return self.path
+
+    def __repr__(self):
+        return f'<ListedEntry {self.name!r}>'
+
+
+class Listing(Sequence):
+    """The entries of a directory, read in a single pass before anything is renamed.
+
+    Renaming while os.scandir is still reading a directory may yield a renamed entry
+    twice or skip one on some filesystems. A Listing closes the scan first and keeps
+    the names packed into a single buffer, with an inode and a byte of type bits per
+    entry, instead of an os.DirEntry each. Entries are handed out as ListedEntry, made
+    as they're iterated over.
+
+    Attributes
+    ----------
+    path : str
+        The directory listed.
+    natural : bool
+        If the entries are sorted naturally, see natural_key, instead of in the order
+        of the directory.
+    """
+
+    __slots__ = ('path', 'natural', '_prefix', '_data', '_ends', '_types', '_inodes')
+
+    def __init__(self, path, natural=False):
+        self.path = path
+        self.natural = natural
+        self._prefix = os.path.join(path, '')
+        self._data = bytearray()
+        self._ends = array('Q')
+        self._types = bytearray()
+        self._inodes = array('Q')
+
+        data, ends, types, inodes = self._data, self._ends, self._types, self._inodes
+        # a bytes path makes scandir hand out bytes names, which are packed as they are
+        with os.scandir(os.fsencode(path)) as it:
+            for entry in it:
+                data += entry.name
+                ends.append(len(data))
+                if entry.is_symlink():
+                    types.append(SYMLINK)
+                elif entry.is_dir(follow_symlinks=False):
+                    types.append(DIR)
+                else:
+                    types.append(FILE if entry.is_file(follow_symlinks=False) else 0)
+                inodes.append(entry.inode())
+        if natural:
+            self._sort()
+
+    def _sort(self):
+        order = sorted(range(len(self)), key=lambda index: natural_key(self.name(index)))
+        data, ends = bytearray(), array('Q')
+        for index in order:
+            start = self._ends[index - 1] if index else 0
+            data += self._data[start:self._ends[index]]
+            ends.append(len(data))
+        self._data, self._ends = data, ends
+        self._types = bytearray(self._types[index] for index in order)
+        self._inodes = array('Q', (self._inodes[index] for index in order))
+
+    def name(self, index):
+        """Returns the name of the entry at index."""
+        start = self._ends[index - 1] if index else 0
+        return self._data[start:self._ends[index]].decode(_ENCODING, _ERRORS)
+
+    def names(self):
+        """Yields the name of every entry, without making the entries."""
+        data = self._data
+        start = 0
+        for end in self._ends:
+            yield data[start:end].decode(_ENCODING, _ERRORS)
+            start = end
+
+    def __len__(self):
+        return len(self._ends)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            raise TypeError("Listing indices must be integers, not slices.")
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Listing index out of range.")
+        name = self.name(index)
+        return ListedEntry(name, self._prefix + name, self._types[index], self._inodes[index])
+
+    def __iter__(self):
+        data, prefix, types, inodes = self._data, self._prefix, self._types, self._inodes
+        start = 0
+        for index, end in enumerate(self._ends):
+            name = data[start:end].decode(_ENCODING, _ERRORS)
+            start = end
+            yield ListedEntry(name, prefix + name, types[index], inodes[index])
+
+    def __repr__(self):
+        return f'<Listing {self.path!r} entries={len(self)}>'
@@ -0,0 +1,140 @@
+"""
+MIT License
+
+Copyright (c) 2020-2021 Euphyzr
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import re
+from functools import lru_cache
+
+_META = frozenset('.^$*+?{}[]\\|()')
+
+def _literal(text):
+    """Returns the string text matches if it's a plain literal, None otherwise."""
+    chars = []
+    index = 0
+    while index < len(text):
+        char = text[index]
+        if char == '\\':
+            escaped = text[index + 1:index + 2]
+            # escaped letters and digits are classes, backreferences or special characters
+            if not escaped or escaped.isalnum() or escaped == '_':
+                return None
+            chars.append(escaped)
+            index += 2
+        elif char in _META:
+            return None
+        else:
+            chars.append(char)
+            index += 1
+    return ''.join(chars)
+
+
+class Matcher:
+    """A regex with fast paths for the patterns which don't need the regex engine.
+
+    Literals, like \\[example\\], and literals anchored to the start (^ or \\A), the end
+    ($ or \\Z) or both are recognized. Names not containing the literal are returned
+    as they are without running the regex, and with a replacement that has no
+    backslashes, the matching ones are replaced with str.replace or slicing. Anything
+    else is left to the compiled regex, which is also used through sub for callable
+    replacements, like the ones of templates.
+
+    Attributes
+    ----------
+    pattern : re.Pattern
+        The compiled regex.
+    kind : str
+        'literal', 'prefix', 'suffix', 'exact' or 'regex'.
+    literal : str
+        The string matched, for every kind other than 'regex'.
+    """
+
+    __slots__ = ('pattern', 'kind', 'literal', '_newline')
+
+    def __init__(self, pattern):
+        self.pattern = pattern if isinstance(pattern, re.Pattern) else re.compile(pattern)
+        self.kind, self.literal = self.analyze(self.pattern)
+        # $ also matches before a trailing newline, which endswith doesn't know about
+        self._newline = self.pattern.pattern.endswith('$')
+
+    @staticmethod
+    def analyze(pattern):
+        """Returns the kind and the literal of a compiled pattern."""
+        text = pattern.pattern
+        if not isinstance(text, str) or pattern.flags & ~re.UNICODE:
+            return 'regex', None
+        start = text.startswith(('^', '\\A'))
+        if start:
+            text = text[1 if text[0] == '^' else 2:]
+        end = False
+        for anchor in ('\\Z', '$'):
+            if text.endswith(anchor) and _literal(text[:-len(anchor)]) is not None:
+                text = text[:-len(anchor)]
+                end = True
+                break
+        literal = _literal(text)
+        if not literal:
+            return 'regex', None
+        return ('exact' if end else 'prefix') if start else ('suffix' if end else 'literal'), literal
+
+    def sub(self, repl, name):
+        """Returns name with the matches replaced by repl, like re.Pattern.sub."""
+        kind = self.kind
+        literal = self.literal
+        if kind == 'literal':
+            if literal not in name:
+                return name
+            if repl.__class__ is str and '\\' not in repl:
+                return name.replace(literal, repl)
+        elif kind == 'prefix':
+            if not name.startswith(literal):
+                return name
+            if repl.__class__ is str and '\\' not in repl:
+                return repl + name[len(literal):]
+        elif kind == 'regex' or (self._newline and name.endswith('\n')):
+            return self.pattern.sub(repl, name)
+        elif kind == 'suffix':
+            if not name.endswith(literal):
+                return name
+            if repl.__class__ is str and '\\' not in repl:
+                return name[:-len(literal)] + repl
+        else:
+            if name != literal:
+                return name
+            if repl.__class__ is str and '\\' not in repl:
+                return repl
+        return self.pattern.sub(repl, name)
+
+
+@lru_cache(maxsize=64)
+def _compile(regex):
+    return Matcher(regex)
+
+def compile_matcher(regex):
+    """Returns a Matcher for regex, a string, a compiled pattern or a Matcher. Matchers of
+    strings are cached, so presets used over and over are only analyzed once."""
+    if isinstance(regex, Matcher):
+        return regex
+    if isinstance(regex, str):
+        return _compile(regex)
+    return Matcher(regex)
@@ -0,0 +1,120 @@
+"""
+MIT License
+
+Copyright (c) 2020-2021 Euphyzr
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import os
+import errno
+import shutil
+
+def _copy_data(source, target, size):
+    """Copies size bytes between two file descriptors within the kernel where possible."""
+    copy_file_range = getattr(os, 'copy_file_range', None)
+    sendfile = getattr(os, 'sendfile', None)
+    offset = 0
+    while offset < size:
+        try:
+            if copy_file_range:
+                copied = copy_file_range(source, target, size - offset)
+            elif sendfile:
+                copied = sendfile(target, source, offset, size - offset)
+                os.lseek(source, offset + copied, os.SEEK_SET)
+            else:
+                with open(source, 'rb', closefd=False) as fsource, open(target, 'wb', closefd=False) as ftarget:
+                    shutil.copyfileobj(fsource, ftarget, 1 << 20)
+                return
+        except OSError as err:
+            # copy_file_range can't cross filesystems on older kernels, sendfile may not take regular files
+            if err.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSOCK):
+                raise
+            if copy_file_range:
+                copy_file_range = None
+            elif sendfile:
+                sendfile = None
+            continue
+        if not copied:
+            break
+        offset += copied
+
+def copy_file(original, new_name):
+    """Copies a file with its metadata and syncs it, never replacing new_name.
+
+    The data is copied by copy_file_range or sendfile, so it never goes through Python,
+    into a temporary name next to new_name which is only linked into place once complete.
+    """
+    if os.path.islink(original):
+        os.symlink(os.readlink(original), new_name)
+        return
+    partial = f'{new_name}.ezrename~part'
+    try:
+        with open(original, 'rb') as fsource, open(partial, 'xb') as ftarget:
+            _copy_data(fsource.fileno(), ftarget.fileno(), os.fstat(fsource.fileno()).st_size)
+        shutil.copystat(original, partial)
+        fd = os.open(partial, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        try:
+            os.link(partial, new_name)
+        except FileExistsError:
+            raise
+        except OSError:
+            # filesystems without hard links
+            if os.path.lexists(new_name):
+                raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), new_name)
+            os.rename(partial, new_name)
+    finally:
+        if os.path.lexists(partial):
+            os.remove(partial)
+
+def move(original, new_name, rename=os.rename):
+    """Moves original to new_name, creating the missing parent directories of new_name.
+
+    On another device, where rename fails with EXDEV, files are copied with copy_file,
+    and directories with everything in them, before original is removed.
+
+    rename : function [Optional]
+        Renames within a device, os.rename by default.
+    """
+    try:
+        return rename(original, new_name)
+    except FileNotFoundError:
+        parent = os.path.dirname(new_name)
+        if not parent or os.path.isdir(parent) or not os.path.lexists(original):
+            raise
+        os.makedirs(parent, exist_ok=True)
+        return move(original, new_name, rename)
+    except OSError as err:
+        if err.errno != errno.EXDEV:
+            raise
+
+    os.makedirs(os.path.dirname(new_name) or os.curdir, exist_ok=True)
+    if os.path.isdir(original) and not os.path.islink(original):
+        if os.path.lexists(new_name):
+            raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), new_name)
+        shutil.copytree(original, new_name, symlinks=True, copy_function=copy_file)
+        shutil.rmtree(original)
+    else:
+        copy_file(original, new_name)
+        os.remove(original)
@@ -0,0 +1,72 @@
+"""
+MIT License
+
+Copyright (c) 2020-2021 Euphyzr
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import os
+import json
+
+def write_plan(fp, path, source):
+    """Streams the (original, new_name) pairs of source into a plan file. Returns the number of pairs.
+
+    The plan is json lines, a header naming path as an absolute path and then one
+    [original, new_name] pair per line, both relative to path, or absolute if they're
+    outside of it. Nothing but the current pair is kept in memory.
+
+    fp : file object
+        A text file open for writing.
+    path : str
+        The directory source renames in.
+    source : Iterable[Tuple[str, str]]
+        Pairs of original and to be renamed path, usually from renamed_files.
+    """
+    prefix = os.path.join(path, '')
+    # paths elsewhere, like the targets of --dest, are kept absolute so they don't depend on the working directory
+    relative = lambda filepath: filepath[len(prefix):] if filepath.startswith(prefix) else os.path.abspath(filepath)
+
+    # the plan may be applied from another working directory
+    fp.write(json.dumps({'ezrename-plan': 1, 'path': os.path.abspath(path)}) + '\n')
+    count = 0
+    for original, new_name in source:
+        fp.write(json.dumps([relative(original), relative(new_name)], ensure_ascii=False) + '\n')
+        count += 1
+    return count
+
+def read_plan(fp):
+    """Returns the directory of a plan file and a generator of its (original, new_name) pairs.
+
+    fp : file object
+        A text file open for reading, written by write_plan.
+    """
+    header = json.loads(fp.readline() or '{}')
+    if 'ezrename-plan' not in header:
+        raise ValueError("Not an EZrename plan file.")
+    path = header['path']
+
+    def pairs():
+        for line in fp:
+            if line.strip():
+                original, new_name = json.loads(line)
+                yield os.path.join(path, original), os.path.join(path, new_name)
+
+    return path, pairs()
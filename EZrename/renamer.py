@@ -23,58 +23,739 @@ SOFTWARE.
 """
 
 import os
-import re
+import sys
+import errno
+import time
+import functools
+from array import array
+from collections.abc import Mapping, ItemsView
+from contextlib import nullcontext
 
-def get_files(path, predicates=None):
-    """Filters and yields os.DirEntry according to provided predicates, after yielding the path."""
+from .template import compile_template
+from .matching import compile_matcher
+from .listing import Listing
+
+def _scan(path):
+    """Returns the entries of a directory as a list, so the scan can run on a worker thread."""
+    with os.scandir(path) as it:
+        return list(it)
+
+def _walk(executor, future, depth, max_depth, scan=_scan):
+    """Yields the entries of a scanned directory after the entries of its subdirectories."""
+    entries = future.result()
+    if max_depth is None or depth < max_depth:
+        # submit every subdirectory before descending into the first one so that
+        # siblings are being scanned while we are busy with the current subtree
+        subdirs = [
+            executor.submit(scan, entry.path)
+            for entry in entries if entry.is_dir(follow_symlinks=False)
+        ]
+        for subdir in subdirs:
+            yield from _walk(executor, subdir, depth + 1, max_depth, scan)
+    yield from entries
+
+def _scan_iter(path):
+    """Lazily yields the entries of a single directory."""
     with os.scandir(path) as it:
-        for entry in it:
-            if predicates:
-                if all(p(entry) for p in predicates):
-                    yield entry
+        yield from it
+
+def walk_files(path, max_depth=None, workers=None, listing=False, natural=False, names=None):
+    """Recursively yields os.DirEntry of path, scanning subdirectories in parallel.
+
+    The entries of a directory are always yielded before the directory itself, so
+    children can be renamed before their parents without invalidating their paths.
+
+    max_depth : int [Optional]
+        How deep to descend. 0 only scans path itself, None has no limit.
+    workers : int [Optional]
+        Number of threads scanning directories. Defaults to ThreadPoolExecutor's default.
+    listing : bool [Optional]
+        Keeps every scanned directory as a compact EZrename.listing.Listing, which yields
+        ListedEntry, instead of a list of os.DirEntry.
+    natural : bool [Optional]
+        Yields the entries of each directory in natural order, file2 before file10. Implies listing.
+    names : dict [Optional]
+        Filled with the set of names of every directory, as soon as it's scanned, see get_files.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    scan = functools.partial(Listing, natural=natural) if listing or natural else _scan
+    if names is not None:
+        scan = _noting(scan, names)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        yield from _walk(executor, executor.submit(scan, path), 0, max_depth, scan)
+
+def get_files(path, predicates=None, recursive=False, max_depth=None, workers=None, stats=None,
+              listing=False, natural=False, names=None):
+    """Filters and yields os.DirEntry according to provided predicates, after yielding the path.
+
+    recursive : bool [Optional]
+        Also yields the entries of subdirectories, see walk_files.
+    max_depth : int [Optional]
+        Maximum depth of a recursive scan.
+    workers : int [Optional]
+        Number of threads used by a recursive scan.
+    stats : EZrename.stats.Stats [Optional]
+        Times scanning and filtering as the scan phase and counts the scanned entries.
+    listing : bool [Optional]
+        Reads each directory in one pass into a compact EZrename.listing.Listing before
+        yielding any of its entries, so renaming can't disturb the scan. The entries are
+        EZrename.listing.ListedEntry then.
+    natural : bool [Optional]
+        Yields the entries in natural order, file2 before file10, so numbered templates
+        are deterministic. Implies listing.
+    names : dict [Optional]
+        Filled with the set of names, before filtering, of every scanned directory. Pass it to
+        rename, which then checks for collisions without listing the directories again. A
+        directory read whole, by a recursive scan or a listing, has its names set before any of
+        its entries is yielded, a live scan only has them all once it's over.
+    """
+    if recursive:
+        entries = walk_files(
+            path, max_depth=max_depth, workers=workers, listing=listing, natural=natural, names=names
+        )
+    elif listing or natural:
+        scan = functools.partial(Listing, natural=natural)
+        entries = iter(_noting(scan, names)(path) if names is not None else scan(path))
+    else:
+        entries = _scan_iter(path)
+        if names is not None:
+            entries = _noted(entries, names)
+    if stats:
+        entries = stats.counted('entries', entries)
+    if predicates:
+        if len(predicates) == 1:
+            match = predicates[0]
+        else:
+            match = lambda entry: all(p(entry) for p in predicates)
+        entries = filter(match, entries)
+    yield from stats.track('scan', entries) if stats else entries
+
+def _noting(scan, names):
+    """Returns scan, a function reading a whole directory, also setting the names it read in names."""
+    def noted(path):
+        entries = scan(path)
+        # keyed like os.path.dirname of the entries' paths
+        names[os.path.dirname(os.path.join(path, '_'))] = set(
+            entries.names() if isinstance(entries, Listing) else (entry.name for entry in entries)
+        )
+        return entries
+    return noted
+
+def _noted(entries, names):
+    """Yields entries, adding each name to the set of its directory in names."""
+    for entry in entries:
+        directory = os.path.dirname(entry.path)
+        try:
+            names[directory].add(entry.name)
+        except KeyError:
+            names[directory] = {entry.name}
+        yield entry
+
+def renamed_files(path, files, regex, replace_with, snapshot=None, stats=None, dest=None):
+    """Yields full path of original and renamed name of files, based on regex and replace_with.
+    Files whose name doesn't change are left out, unless they're moved to dest.
+
+    regex : str, re.Pattern or EZrename.matching.Matcher
+        The pattern, literal and anchored ones skip the regex engine, see Matcher.
+    replace_with : str or EZrename.template.Template
+        The replacement, which may use metadata tokens like {n:03d} or {mtime:%Y%m%d}, see Template.
+        Pass the same Template to keep counting {n} across calls.
+    snapshot : EZrename.snapshot.Snapshot [Optional]
+        Skips the files which conformed in an earlier run, and records the ones which conform now.
+    stats : EZrename.stats.Stats [Optional]
+        Times the substitution as the transform phase and counts matches and skips.
+    dest : str [Optional]
+        Moves every file into this directory, keeping its place in a recursive scan of path.
+        Carry it out with rename(move=True).
+    """
+    pattern  = compile_matcher(regex)
+    template = compile_template(replace_with)
+    counts = stats.counts if stats else {}
+
+    sub = pattern.sub
+    static = template.tail if template.static else None
+    prefix = os.path.join(path, '')
+    dest_prefix = os.path.join(dest, '') if dest else None
+
+    def pairs():
+        for entry in files:
+            if snapshot and snapshot.conforms(entry):
+                counts['skips'] = counts.get('skips', 0) + 1
+                continue
+            name = entry.name
+            new_name = sub(template.replacement(entry) if static is None else static, name)
+            if new_name == name and not dest:
+                if snapshot:
+                    snapshot.add(entry)
+                counts['skips'] = counts.get('skips', 0) + 1
+                continue
+            if snapshot:
+                snapshot.changes += 1
+            # we only want to change the file name not the whole path, so swap it in the
+            # entry's own path, which is in path itself unless the scan was recursive
+            original = entry.path
+            if dest:
+                yield original, dest_prefix + original[len(prefix):len(original) - len(name)] + new_name
+            else:
+                yield original, original[:len(original) - len(name)] + new_name
+
+    yield from stats.counted('matches', stats.track('transform', pairs())) if stats else pairs()
+
+def _numbered(path, count):
+    """Returns path with a (count) suffix before its extension."""
+    name, ext = os.path.splitext(path)
+    return f'{name} ({count}){ext}'
+
+def _free_name(path):
+    """Returns the first numbered variant of path that doesn't exist on disk."""
+    count = 1
+    while os.path.lexists(_numbered(path, count)):
+        count += 1
+    return _numbered(path, count)
+
+class _NameIndex:
+    """A hash index of existing names, listing each target directory only once. Directories
+    the scan already read, see get_files(names=...), aren't listed at all, and with list_targets
+    False the others aren't either, each name is looked up on its own."""
+
+    def __init__(self, names=None, list_targets=True):
+        self.listings = dict(names) if names else {}
+        self.list_targets = list_targets
+
+    def __contains__(self, path):
+        directory, name = os.path.split(path)
+        try:
+            listing = self.listings[directory]
+        except KeyError:
+            if not self.list_targets:
+                return os.path.lexists(path)
+            try:
+                listing = set(os.listdir(directory or os.curdir))
+            except OSError:
+                listing = set()
+            self.listings[directory] = listing
+        return name in listing
+
+def _invalid_target(original, new_name, move):
+    """Returns an OSError if new_name can't be a name for original, else None. Names can't be
+    empty, . or .., or hold a separator, which would put the entry in another directory."""
+    name = os.path.basename(new_name)
+    if name in ('', os.curdir, os.pardir):
+        return OSError(errno.EINVAL, 'Invalid name', original, None, new_name)
+    if not move and os.path.dirname(new_name) != os.path.dirname(original):
+        return OSError(errno.EINVAL, 'Name contains a path separator', original, None, new_name)
+    return None
+
+def plan_renames(source, names=None, list_targets=True, move=False, on_invalid=None):
+    """Returns an ordered, collision-free list of (original, new_name) tuples from source.
+
+    Collisions with existing names or other targets are resolved by numbering the target,
+    with a separate counter per name. Targets freed by another rename are ordered after it,
+    and rename cycles (a -> b, b -> a) go through a temporary name. Unchanged names are dropped,
+    and so are invalid ones, like empty names or names holding a path separator.
+
+    source : Sequence[Tuple[str, str]]
+        Pairs of original and to be renamed path, usually from renamed_files.
+    names : dict [Optional]
+        The names of the directories scanned for source, from get_files(names=...). The
+        scan has to be over, which it is once source is.
+    list_targets : bool [Optional]
+        Lists the target directories which weren't scanned, once each. False checks every target
+        on its own instead, which is cheaper for a few renames in a large directory.
+    move : bool [Optional]
+        Lets targets be in another directory than their original, as rename(move=True) does.
+    on_invalid : function [Optional]
+        A function to be called with an OSError for every invalid target, which is left out.
+    """
+    pairs = []
+    for original, new_name in source:
+        error = _invalid_target(original, new_name, move) if original != new_name else None
+        if error is None:
+            pairs.append((original, new_name))
+        elif on_invalid:
+            on_invalid(error)
+    moving = {original for original, new_name in pairs if original != new_name}
+    claimed = {new_name for original, new_name in pairs if original == new_name}
+    existing = _NameIndex(names, list_targets)
+    counts = {}
+    targets = {}
+
+    for original, new_name in pairs:
+        if original == new_name:
+            continue
+        candidate = new_name
+        # names of moving entries are freed, so they're only taken if another target claimed them
+        while candidate in claimed or (candidate not in moving and candidate in existing):
+            counts[new_name] = counts.get(new_name, 0) + 1
+            candidate = _numbered(new_name, counts[new_name])
+        claimed.add(candidate)
+        # numbering may lead back to the original name, like a second run over numbered duplicates
+        if candidate != original:
+            targets[original] = candidate
+
+    plan = []
+    done = set()
+    for start in targets:
+        # follow the chain of renames whose target is still occupied by the next source
+        chain = []
+        current = start
+        while current in targets and current not in done:
+            done.add(current)
+            chain.append(current)
+            current = targets[current]
+
+        if chain and current == start:
+            # a cycle, park the first entry on a temporary name to free its target
+            count = 1
+            while f'{start}.ezrename~{count}' in claimed or f'{start}.ezrename~{count}' in existing:
+                count += 1
+            temporary = f'{start}.ezrename~{count}'
+            claimed.add(temporary)
+            plan.append((start, temporary))
+            plan.extend((original, targets[original]) for original in reversed(chain[1:]))
+            plan.append((temporary, targets[start]))
+        else:
+            plan.extend((original, targets[original]) for original in reversed(chain))
+
+    return plan
+
+def _ancestors(path):
+    """Yields every parent directory of path."""
+    parent = os.path.dirname(path)
+    while parent and parent != path:
+        yield parent
+        path, parent = parent, os.path.dirname(parent)
+
+def rename_waves(plan):
+    """Splits a plan into waves of renames which don't depend on each other.
+
+    A rename has to wait for earlier renames of the same name (a freed-up or temporary
+    name), of anything inside it (contents before their directory) and of any of its
+    parent directories. Every wave keeps the order of the plan.
+    """
+    waves = []
+    levels = {}
+    contents = {}
+
+    for original, new_name in plan:
+        level = max(
+            levels.get(original, -1), levels.get(new_name, -1),
+            contents.get(original, -1), contents.get(new_name, -1),
+            *(levels.get(parent, -1) for parent in _ancestors(original)),
+            *(levels.get(parent, -1) for parent in _ancestors(new_name)),
+        ) + 1
+        levels[original] = levels[new_name] = level
+        for parent in (*_ancestors(original), *_ancestors(new_name)):
+            contents[parent] = max(contents.get(parent, -1), level)
+
+        if level == len(waves):
+            waves.append([])
+        waves[level].append((original, new_name))
+
+    return waves
+
+_ENCODING = sys.getfilesystemencoding()
+_ERRORS = sys.getfilesystemencodeerrors()
+
+class _BatchItems(ItemsView):
+    __slots__ = ()
+
+    def __iter__(self):
+        return self._mapping._pairs(range(len(self._mapping)))
+
+    def __reversed__(self):
+        return self._mapping._pairs(reversed(range(len(self._mapping))))
+
+class BatchResult(Mapping):
+    """The (new_name: original) history of a batch of renames, in the order they happened.
+
+    The directory is kept once and the names relative to it are packed into a single
+    buffer, which takes a fraction of the memory of a dict of full paths. It's a mapping
+    for existing callers. items() and reversed(items()) stream the pairs without building
+    any index, and the index for looking up an original by its new name is only built on
+    the first lookup.
+
+    Attributes
+    ----------
+    base : str
+        The directory names are kept relative to. It's moved up as needed to contain every
+        name, starting from the directory of the first original if not given.
+    """
+
+    __slots__ = ('base', '_prefix', '_data', '_ends', '_index')
+
+    def __init__(self, items=(), base=None):
+        self.base = base
+        self._prefix = None if base is None else os.path.join(base, '') if base else ''
+        self._data = bytearray()
+        self._ends = array('Q')
+        self._index = None
+        self.update(items)
+
+    def _decode(self, position):
+        start = self._ends[position - 1] if position else 0
+        return self._prefix + self._data[start:self._ends[position]].decode(_ENCODING, _ERRORS)
+
+    def _rebase(self, *paths):
+        """Moves the base up to a directory containing paths, repacking the names kept so far.
+        A recursive batch moves it up once per level at most."""
+        if self._prefix is None:
+            paths = (os.path.dirname(paths[-1]) + os.sep, *paths)
+        else:
+            paths = (self._prefix, *paths)
+        common = os.path.commonprefix(paths)
+        # cut back to a whole directory, without normalizing anything so every path still starts with it
+        prefix = common[:max(common.rfind(os.sep), common.rfind(os.altsep or os.sep)) + 1]
+        pairs = list(self.items()) if self._ends else []
+        self.base = os.path.dirname(prefix)
+        self._prefix = prefix
+        self._data = bytearray()
+        self._ends = array('Q')
+        self._index = None
+        self.update(pairs)
+
+    def add(self, new_name, original):
+        """Appends the rename of original to new_name."""
+        if self._prefix is None or not (new_name.startswith(self._prefix) and original.startswith(self._prefix)):
+            self._rebase(new_name, original)
+        start = len(self._prefix)
+        self._data += new_name[start:].encode(_ENCODING, _ERRORS)
+        self._ends.append(len(self._data))
+        self._data += original[start:].encode(_ENCODING, _ERRORS)
+        self._ends.append(len(self._data))
+        if self._index is not None:
+            self._index_add(len(self) - 1, new_name)
+
+    def update(self, items):
+        """Appends every (new_name, original) of items, a mapping or an iterable of pairs."""
+        for new_name, original in items.items() if isinstance(items, Mapping) else items:
+            self.add(new_name, original)
+
+    def _pairs(self, positions):
+        for position in positions:
+            yield self._decode(2 * position), self._decode(2 * position + 1)
+
+    def __len__(self):
+        return len(self._ends) // 2
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self._decode(2 * position)
+
+    def __reversed__(self):
+        for position in reversed(range(len(self))):
+            yield self._decode(2 * position)
+
+    def _index_add(self, position, name):
+        # hashes rather than the names themselves, to keep the index small. A hash maps to the
+        # position of its name, or to a list of positions for the rare names sharing a hash
+        key = hash(name)
+        found = self._index.get(key)
+        if found is None:
+            self._index[key] = position
+        elif isinstance(found, int):
+            # a later rename to the same name replaces the earlier one, like in a dict
+            self._index[key] = position if self._decode(2 * found) == name else [found, position]
+        else:
+            self._index[key] = [other for other in found if self._decode(2 * other) != name] + [position]
+
+    def __getitem__(self, new_name):
+        if self._index is None:
+            self._index = {}
+            for position, name in enumerate(self):
+                self._index_add(position, name)
+        found = self._index.get(hash(new_name))
+        if found is None:
+            raise KeyError(new_name)
+        for position in (found,) if isinstance(found, int) else found:
+            if self._decode(2 * position) == new_name:
+                return self._decode(2 * position + 1)
+        raise KeyError(new_name)
+
+    def items(self):
+        return _BatchItems(self)
+
+    def __reduce__(self):
+        return _restore_batch, (self.base, bytes(self._data), self._ends.tobytes())
+
+    def __repr__(self):
+        return f'<BatchResult base={self.base!r} renames={len(self)}>'
+
+def _restore_batch(base, data, ends):
+    result = BatchResult(base=base)
+    result._data = bytearray(data)
+    result._ends.frombytes(ends)
+    return result
+
+def compose_history(steps):
+    """Returns the (new_name: original) BatchResult of renames which were carried out in order.
+
+    A name which is renamed again by a later step, like the temporary name of a rename
+    cycle, is folded into that later rename.
+    """
+    steps = list(steps)
+    sources = {original for original, new_name in steps}
+    vacated = set()
+    parked = {}
+    history = BatchResult()
+
+    for original, new_name in steps:
+        vacated.add(original)
+        original = parked.pop(original, original)
+        if new_name in sources and new_name not in vacated:
+            parked[new_name] = original
+        else:
+            history.add(new_name, original)
+
+    return history
+
+RENAME_NOREPLACE = 1
+_renameat2 = None
+
+def _load_renameat2():
+    """Returns a renameat2(src_fd, src, dst_fd, dst) refusing to replace dst, calling libc's
+    renameat2 with RENAME_NOREPLACE, or False where it isn't available."""
+    global _renameat2
+    if _renameat2 is None:
+        _renameat2 = False
+        if os.rename in os.supports_dir_fd:
+            import ctypes
+            import ctypes.util
+
+            try:
+                libc_renameat2 = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True).renameat2
+            except (OSError, AttributeError):
+                return _renameat2
+
+            def renameat2(src_fd, src, dst_fd, dst):
+                if libc_renameat2(src_fd, os.fsencode(src), dst_fd, os.fsencode(dst), RENAME_NOREPLACE):
+                    err = ctypes.get_errno()
+                    raise OSError(err, os.strerror(err), src, None, dst)
+
+            _renameat2 = renameat2
+    return _renameat2
+
+class _DirHandles:
+    """A bounded cache of open directory descriptors, so a rename only resolves the bare names
+    relative to their directories instead of walking both whole paths every time.
+
+    A handle is open for as long as it's in use, even if it was pushed out of the cache meanwhile.
+    """
+
+    def __init__(self, size=64):
+        import threading
+        from collections import OrderedDict
+
+        self.size = size
+        self.handles = OrderedDict()
+        self.lock = threading.Lock()
+
+    def acquire(self, directory):
+        """Returns the [fd, users, cached] handle of directory, which has to be released."""
+        with self.lock:
+            handle = self.handles.get(directory)
+            if handle:
+                self.handles.move_to_end(directory)
+                handle[1] += 1
+                return handle
+        # opened outside of the lock, as it may take a while on a network filesystem
+        fd = os.open(directory or os.curdir, os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0))
+        with self.lock:
+            handle = self.handles.get(directory)
+            if handle:
+                os.close(fd)
             else:
-                yield entry
+                handle = self.handles[directory] = [fd, 0, True]
+                while len(self.handles) > self.size:
+                    self._drop(self.handles.popitem(last=False)[1])
+            handle[1] += 1
+            return handle
+
+    def release(self, handle):
+        with self.lock:
+            handle[1] -= 1
+            if not handle[1] and not handle[2]:
+                os.close(handle[0])
+
+    def _drop(self, handle):
+        handle[2] = False
+        if not handle[1]:
+            os.close(handle[0])
+
+    def forget(self, path):
+        """Drops the handles of path and anything inside it, once it has been renamed."""
+        prefix = path + os.sep
+        with self.lock:
+            for directory in [d for d in self.handles if d.startswith(prefix) or d == path]:
+                self._drop(self.handles.pop(directory))
+
+    def close(self):
+        with self.lock:
+            while self.handles:
+                self._drop(self.handles.popitem()[1])
+
+    def __enter__(self):
+        return self
 
-def renamed_files(path, files, regex, replace_with):
-    """Yields full path of original and renamed name of files, based on regex and replace_with."""
-    pattern  = re.compile(regex)
-    for entry in files:
-        # we only want to change the file name not the whole path, so use os.path.join
-        new_name = os.path.join(path, pattern.sub(replace_with, entry.name))
-        original = entry.path
-        yield original, new_name
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def _rename_at(handles, original, new_name):
+    """Renames original to new_name relative to their cached directories, never replacing
+    new_name if renameat2 is available."""
+    src_dir, src = os.path.split(original)
+    dst_dir, dst = os.path.split(new_name)
+    renameat2 = _load_renameat2()
+    src_handle = handles.acquire(src_dir)
+    try:
+        dst_handle = src_handle if dst_dir == src_dir else handles.acquire(dst_dir)
+        try:
+            if renameat2:
+                try:
+                    return renameat2(src_handle[0], src, dst_handle[0], dst)
+                except OSError as err:
+                    # filesystems without RENAME_NOREPLACE support fall back to a plain rename
+                    if err.errno not in (errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP):
+                        raise
+            os.rename(src, dst, src_dir_fd=src_handle[0], dst_dir_fd=dst_handle[0])
+        finally:
+            if dst_handle is not src_handle:
+                handles.release(dst_handle)
+    except OSError as err:
+        err.filename, err.filename2 = original, new_name
+        raise
+    finally:
+        handles.release(src_handle)
 
 def rename(
     source,
     on_rename=lambda original, new_name: print(original, '->', new_name),
-    on_permission_error=lambda err: print(f"{err}\nSkipping...\n")
+    on_permission_error=lambda err: print(f"{err}\nSkipping...\n"),
+    on_plan=lambda plan: None,
+    jobs=None,
+    journal=None,
+    stats=None,
+    dir_handles=64,
+    move=False,
+    names=None,
+    list_targets=True
 ):
     """Renames based on source, which is an sequence of tuple of original and to be renamed path. Return
-    a dictionary of (new_name: old_name) key, value pair.
+    a BatchResult, a mapping of (new_name: old_name) key, value pair.
+
+    The source is planned with plan_renames first, so existing files are never overwritten.
 
     source : Sequence[Tuple[str, str]]
         Rename all files in the source from their original name to new_name
     on_rename : function [Optional]
         A function to be called after each rename. Takes original and to-be renamed path as an input.
     on_permission_error : function [Optional]
-        A function to be called on PermissionError. Takes error as the input.
+        A function to be called when an entry can't be renamed, on PermissionError or any other
+        OSError, and for the invalid targets left out of the plan. Takes error as the input.
+    on_plan : function [Optional]
+        A function to be called with the list of planned renames, before any of them happens.
+        EZrename.report.Reporter takes care of all three callbacks without printing per rename.
+    jobs : int [Optional]
+        Number of renames to run concurrently, see rename_waves. Callbacks are still called
+        from the calling thread and in the order of the plan.
+    journal : EZrename.journal.Journal [Optional]
+        Records every group of renames before it's carried out, see Journal.
+    stats : EZrename.stats.Stats [Optional]
+        Times the plan and rename phases, records rename latencies and counts renames and errors.
+    dir_handles : int [Optional]
+        Number of directories kept open, so renames don't resolve whole paths over and over.
+        Where supported, renameat2 also makes sure nothing is replaced. 0 renames by path.
+    move : bool [Optional]
+        Lets renames go into other directories and devices, see EZrename.mover.move. Missing
+        directories are created, and files on another device are copied and then removed.
+    names : dict [Optional]
+        The names of the scanned directories, see plan_renames.
+    list_targets : bool [Optional]
+        If the target directories which weren't scanned are listed, see plan_renames.
     """
-    same_name_count = 1
-    history = {}
+    def on_invalid(err):
+        if stats:
+            stats.counts['errors'] += 1
+        on_permission_error(err)
 
-    for original, new_name in source:
+    with stats.phase('plan') if stats else nullcontext():
+        plan = plan_renames(source, names, list_targets, move=move, on_invalid=on_invalid)
+    on_plan(plan)
+    sources = {original for original, new_name in plan}
+    vacated = set()
+    stuck = set()
+    parked = {}
+    history = BatchResult()
+    handles = _DirHandles(dir_handles) if dir_handles and os.rename in os.supports_dir_fd else None
+    rename_path = functools.partial(_rename_at, handles) if handles else os.rename
+    if move:
+        from .mover import move as move_path
+        rename_path = functools.partial(move_path, rename=rename_path)
+
+    def attempt(step):
+        original, new_name = step
+        if new_name in stuck:
+            # the entry that was supposed to free this name couldn't be renamed
+            new_name = _free_name(new_name)
+        start = time.perf_counter()
         try:
-            os.rename(original, new_name)
-        except PermissionError as perm_err:
-            on_permission_error(perm_err)
-            continue
-        except FileExistsError:
-            name, ext = os.path.splitext(new_name)
-            new_name = f'{name} ({same_name_count}){ext}'
-            os.rename(original, new_name)
-            same_name_count += 1
-
-        history[new_name] = original
-        on_rename(original, new_name)
+            try:
+                rename_path(original, new_name)
+            except FileExistsError:
+                new_name = _free_name(new_name)
+                rename_path(original, new_name)
+        except OSError as err:
+            return step, new_name, err, time.perf_counter() - start
+        if handles:
+            # the handles of a renamed directory would still point to it under its new name
+            handles.forget(original)
+        return step, new_name, None, time.perf_counter() - start
+
+    concurrent = jobs and jobs > 1
+    # a wave is only submitted once the previous one is done and accounted for
+    groups = rename_waves(plan) if concurrent else [plan]
+    group_size = journal.group_size if journal else None
+
+    if concurrent:
+        from concurrent.futures import ThreadPoolExecutor
+        executor = ThreadPoolExecutor(max_workers=jobs)
+    else:
+        executor = nullcontext()
+
+    with executor, stats.phase('rename') if stats else nullcontext(), handles or nullcontext():
+        run = executor.map if concurrent else map
+        for group in groups:
+            size = group_size or max(len(group), 1)
+            for start in range(0, len(group), size):
+                chunk = group[start:start + size]
+                if journal:
+                    journal.record(chunk)
+
+                for (original, planned), new_name, err, latency in run(attempt, chunk):
+                    if stats:
+                        stats.latency(latency)
+                        stats.counts['errors' if err else 'renames'] += 1
+                    if err:
+                        on_permission_error(err)
+                        stuck.add(original)
+                        if journal:
+                            journal.failed(original)
+                        continue
+                    if journal and new_name != planned:
+                        journal.amend(original, new_name)
+
+                    vacated.add(original)
+                    original = parked.pop(original, original)
+                    if new_name in sources and new_name not in vacated:
+                        # a temporary name of a rename cycle, it will be renamed again later
+                        parked[new_name] = original
+                        continue
+
+                    history.add(new_name, original)
+                    on_rename(original, new_name)
+
+                if journal:
+                    journal.done()
 
     return history
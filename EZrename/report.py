@@ -0,0 +1,141 @@
+"""
+MIT License
+
+Copyright (c) 2020-2021 Euphyzr
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import sys
+import time
+
+class Reporter:
+    """Reports the progress of renames through the callbacks of EZrename.rename.
+
+    Nothing is written per rename: the change list is collected and written in blocks,
+    and the progress line is redrawn at most once per interval, so the output stays
+    cheap even for millions of renames.
+
+    Attributes
+    ----------
+    changes : file object, optional
+        The change list is written here, one "original -> new_name" line per rename.
+    progress : file object, optional
+        A progress line with the rate of renames and an ETA is drawn here, usually stderr.
+    summary : bool, optional
+        Writes the number of renames, errors and the rate when closed.
+    errors : file object, optional
+        Permission errors are written here as they happen. sys.stderr by default.
+    interval : float, optional
+        Seconds between redraws of the progress line and writes of the change list. 0.2 by default.
+    block : int, optional
+        Maximum number of changes kept before writing them. 1000 by default.
+    """
+
+    def __init__(self, changes=None, progress=None, summary=False, errors=None, interval=0.2, block=1000):
+        self.changes = changes
+        self.progress = progress
+        self.summary = summary
+        self.errors = errors or sys.stderr
+        self.interval = interval
+        self.block = block
+        self.total = 0
+        self.renamed = 0
+        self.failed = 0
+        self.started = time.perf_counter()
+        self._buffer = []
+        self._last = self.started
+        self._width = 0
+
+    @property
+    def callbacks(self):
+        """The keyword arguments hooking the reporter into EZrename.rename."""
+        return {
+            'on_rename': self.on_rename,
+            'on_permission_error': self.on_permission_error,
+            'on_plan': self.on_plan,
+        }
+
+    def on_plan(self, plan):
+        self.total += len(plan)
+
+    def on_rename(self, original, new_name):
+        self.renamed += 1
+        if self.changes:
+            self._buffer.append(f'{original} -> {new_name}\n')
+        now = time.perf_counter()
+        if len(self._buffer) >= self.block or now - self._last >= self.interval:
+            self.flush(now)
+
+    def on_permission_error(self, err):
+        self.failed += 1
+        self._clear()
+        self.errors.write(f"{err}\nSkipping...\n\n")
+        self.errors.flush()
+
+    def flush(self, now=None):
+        """Writes the collected changes and redraws the progress line."""
+        self._last = now or time.perf_counter()
+        if self._buffer:
+            self._clear()
+            self.changes.writelines(self._buffer)
+            self.changes.flush()
+            self._buffer = []
+        if self.progress:
+            self._draw()
+
+    def _rate(self):
+        elapsed = time.perf_counter() - self.started
+        return self.renamed / elapsed if elapsed > 0 else 0.0
+
+    def _draw(self):
+        rate = self._rate()
+        done = self.renamed + self.failed
+        line = f"{done}/{self.total} renamed, {rate:.0f}/s"
+        if self.total > done and rate:
+            eta = int((self.total - done) / rate)
+            line += f", ETA {eta // 60}:{eta % 60:02}"
+        self.progress.write('\r' + line.ljust(self._width))
+        self.progress.flush()
+        self._width = len(line)
+
+    def _clear(self):
+        # the change list and the progress line may share a terminal
+        if self._width:
+            self.progress.write('\r' + ' ' * self._width + '\r')
+            self._width = 0
+
+    def close(self):
+        """Writes what's left of the change list and the summary."""
+        self.flush()
+        self._clear()
+        if self.summary:
+            stream = self.progress or sys.stdout
+            stream.write(
+                f"Renamed {self.renamed}, {self.failed} error(s) in "
+                f"{time.perf_counter() - self.started:.2f}s ({self._rate():.0f}/s)\n"
+            )
+            stream.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
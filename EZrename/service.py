@@ -0,0 +1,270 @@
+"""
+MIT License
+
+Copyright (c) 2020-2021 Euphyzr
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import os
+import re
+import json
+import threading
+
+from .renamer import get_files, renamed_files, rename
+from .filters import compile_filter
+from .journal import Journal
+from .matching import compile_matcher
+
+FILTERS = (
+    'only', 'ignore', 'directory', 'glob', 'min_size', 'max_size', 'newer', 'older', 'min_length', 'max_length'
+)
+
+class JobError(Exception):
+    """A rename job that can't be run."""
+
+
+def run_job(job, regex, journal_file):
+    """Scans and renames the path of a prepared job, journaling into journal_file.
+
+    Returns its history and the list of permission errors. The history isn't recorded:
+    that's left to the caller, so this may run in a worker process.
+
+    Parameters
+    ----------
+    job : dict
+        The job, see JobRunner.
+    regex : str or EZrename.matching.Matcher
+        The pattern the job renames by.
+    journal_file : str
+        The journal of the batch, which is kept once done.
+    """
+    path = job['path']
+    predicate = compile_filter(**{flag: job[flag] for flag in FILTERS if flag in job})
+    names = {}
+    files = get_files(
+        path, [predicate] if predicate else None,
+        recursive=job.get('recursive', False), max_depth=job.get('max_depth'),
+        listing=job.get('scan_first', False), natural=job.get('natural', False), names=names
+    )
+    source = renamed_files(path, files, compile_matcher(regex), job.get('replacewith', ''))
+
+    errors = []
+    with Journal(journal_file, path) as journal:
+        history = rename(
+            source, on_rename=lambda original, new_name: None,
+            on_permission_error=lambda err: errors.append(str(err)),
+            jobs=job.get('jobs'), journal=journal, names=names
+        )
+    return history, errors
+
+
+def load_manifest(manifest):
+    """Returns the list of jobs of a manifest file.
+
+    A .toml manifest lists its jobs as [[job]] tables, its top-level keys being the defaults
+    of every job. Any other manifest has a json object per line, as for serve.
+
+    Parameters
+    ----------
+    manifest : str
+        The path of the manifest.
+    """
+    if manifest.endswith('.toml'):
+        try:
+            import tomllib
+        except ImportError:
+            raise JobError("TOML manifests need Python 3.11 or later.") from None
+        with open(manifest, 'rb') as mfp:
+            try:
+                data = tomllib.load(mfp)
+            except tomllib.TOMLDecodeError as err:
+                raise JobError(f"{manifest}: {err}") from None
+        defaults = {key: value for key, value in data.items() if key != 'job'}
+        tables = data.get('job', [])
+        if not isinstance(tables, list):
+            raise JobError(f"{manifest}: jobs have to be [[job]] tables.")
+        return [{**defaults, **table} for table in tables]
+
+    jobs = []
+    with open(manifest, encoding='utf-8') as mfp:
+        for number, line in enumerate(mfp, 1):
+            if not line.strip():
+                continue
+            try:
+                job = json.loads(line)
+            except ValueError as err:
+                raise JobError(f"{manifest}:{number}: {err}") from None
+            if not isinstance(job, dict):
+                raise JobError(f"{manifest}:{number}: A job has to be a json object.")
+            jobs.append(job)
+    return jobs
+
+
+class JobRunner:
+    """Runs rename jobs in a long-running process.
+
+    A job is a dictionary with a path, either a regex or a preset (the default regex
+    otherwise), a replacewith and any filter of EZrename.compile_filter, plus recursive,
+    max_depth and jobs. Compiled patterns are kept across jobs, and every history write
+    goes through a single lock, so jobs may be run from several threads.
+
+    Attributes
+    ----------
+    confighandler : EZrename.utils.ConfigHandler
+        The configuration for presets and history. Its errorer is replaced to raise JobError.
+    """
+
+    def __init__(self, confighandler):
+        self.conf = confighandler
+        self.conf.errorer = self._error
+        self.patterns = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _error(message):
+        raise JobError(message)
+
+    def compile(self, regex):
+        """Returns the Matcher of regex, compiling it only the first time."""
+        try:
+            return self.patterns[regex]
+        except KeyError:
+            pattern = self.patterns[regex] = compile_matcher(regex)
+            return pattern
+
+    def prepare(self, job):
+        """Returns the path, regex and journal file of a job, raising JobError if it can't be run."""
+        path = job.get('path')
+        if not isinstance(path, str) or not os.path.isdir(path):
+            raise JobError(f"Path doesn't exist: {path!r}.")
+        with self.lock:
+            regex = self.conf.get_regex(regex=job.get('regex'), preset_regex=job.get('preset'))
+            journal_file = self.conf.journal_path(path)
+            if os.path.exists(journal_file):
+                raise JobError(f"A batch of rename in '{path}' was interrupted. Use rename --resume or --rollback first.")
+        return path, regex, journal_file
+
+    def record(self, path, history, journal_file):
+        """Adds the history of a finished job and removes its journal."""
+        with self.lock:
+            self.conf.add_history(path, history)
+            self.conf.dump()
+            Journal(journal_file, path).finish()
+
+    def run(self, job):
+        """Runs a job. Returns its result, a dictionary of path, renamed, errors and error if it failed."""
+        path = job.get('path')
+        try:
+            path, regex, journal_file = self.prepare(job)
+            history, errors = run_job(job, self.compile(regex), journal_file)
+            self.record(path, history, journal_file)
+        except (JobError, OSError, ValueError, TypeError, re.error) as err:
+            return {'path': path, 'renamed': 0, 'errors': [], 'error': str(err)}
+
+        return {'path': path, 'renamed': len(history), 'errors': errors}
+
+    def run_many(self, jobs, workers=None):
+        """Runs jobs on a pool of processes, yielding their results in the order of jobs.
+
+        Jobs are prepared here and only scanned and renamed in the workers, which send back
+        their history: this process stays the single writer of the history. At most twice
+        workers jobs are in flight, and a job waits for any earlier job of the same path.
+
+        Parameters
+        ----------
+        jobs : Iterable
+            The jobs, as for run.
+        workers : int [Optional]
+            The number of processes. Defaults to the number of CPUs.
+        """
+        from concurrent.futures import ProcessPoolExecutor
+        from collections import deque
+
+        workers = workers or os.cpu_count() or 1
+        pending = deque()
+        active = set()
+
+        def result(item):
+            path, key, journal_file, future = item
+            # only submitted jobs hold their path, the others may not even have a valid one
+            if key is not None:
+                active.discard(key)
+            try:
+                if isinstance(future, Exception):
+                    raise future
+                history, errors = future.result()
+                self.record(path, history, journal_file)
+            except (JobError, OSError, ValueError, TypeError, re.error) as err:
+                return {'path': path, 'renamed': 0, 'errors': [], 'error': str(err)}
+            return {'path': path, 'renamed': len(history), 'errors': errors}
+
+        with ProcessPoolExecutor(workers) as executor:
+            for job in jobs:
+                path = job.get('path')
+                try:
+                    path, regex, journal_file = self.prepare(job)
+                    key = os.path.realpath(path)
+                    while key in active or len(pending) >= 2 * workers:
+                        yield result(pending.popleft())
+                    active.add(key)
+                    pending.append((path, key, journal_file, executor.submit(run_job, job, regex, journal_file)))
+                except (JobError, OSError, ValueError, TypeError, re.error) as err:
+                    pending.append((path, None, None, err))
+            while pending:
+                yield result(pending.popleft())
+
+    def handle(self, line):
+        """Runs the job of a json line. Returns the json line of its result."""
+        try:
+            job = json.loads(line)
+            if not isinstance(job, dict):
+                raise ValueError("A job has to be a json object.")
+        except ValueError as err:
+            return json.dumps({'path': None, 'renamed': 0, 'errors': [], 'error': str(err)})
+        return json.dumps(self.run(job))
+
+    def serve_lines(self, infile, outfile):
+        """Runs a job for every line of infile, writing its result to outfile."""
+        for line in infile:
+            if line.strip():
+                outfile.write(self.handle(line) + '\n')
+                outfile.flush()
+
+    def serve_socket(self, address):
+        """Accepts connections on a Unix socket, running the jobs of each line and replying per line."""
+        import socketserver
+
+        runner = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    if line.strip():
+                        self.wfile.write(runner.handle(line.decode()).encode() + b'\n')
+                        self.wfile.flush()
+
+        if os.path.exists(address):
+            os.remove(address)
+        with socketserver.ThreadingUnixStreamServer(address, Handler) as server:
+            try:
+                server.serve_forever()
+            finally:
+                os.remove(address)
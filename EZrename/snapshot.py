@@ -0,0 +1,158 @@
+"""
+MIT License
+
+Copyright (c) 2020-2021 Euphyzr
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import os
+
+class Snapshot:
+    """An on-disk index of entries which already conform to a renaming, for repeated runs.
+
+    Entries are keyed by (inode, mtime, size, name): templates, hashing and filters may
+    depend on the contents as well as the name, so an entry found in the index is one
+    that can be skipped without running the regex. A directory is keyed by its (inode,
+    mtime) and is only recorded once a run found nothing to rename in it. As long as
+    neither changes, nothing was added to or renamed in it and it can be skipped without
+    even being scanned. Writing into a file doesn't change the mtime of its directory
+    though, so directories aren't recorded for a renaming which depends on metadata.
+
+    Attributes
+    ----------
+    dbfile : str
+        The path to the database file.
+    key : str
+        Identifies the renaming, the regex, replacement and filters, the index is kept for.
+    metadata : bool, optional
+        If the renaming depends on more than names, like {size} or a size filter. Directories
+        are neither recorded nor skipped then.
+    changes : int, attribute
+        Number of entries which didn't conform in this run.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS directories (
+            key TEXT NOT NULL,
+            path TEXT NOT NULL,
+            inode INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            PRIMARY KEY (key, path)
+        );
+        CREATE TABLE IF NOT EXISTS entries (
+            key TEXT NOT NULL,
+            directory TEXT NOT NULL,
+            inode INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            name TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS entries_directory ON entries (key, directory);
+    """
+
+    def __init__(self, dbfile, key, metadata=False):
+        import sqlite3
+
+        self.dbfile = dbfile
+        self.key = key
+        self.metadata = metadata
+        self.changes = 0
+        self.connection = sqlite3.connect(dbfile, timeout=60)
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(entries)")]
+        if columns and 'mtime_ns' not in columns:
+            # entries of older versions were keyed by name alone, it's only an index so start over
+            with self.connection:
+                self.connection.execute("DROP TABLE entries")
+        self.connection.executescript(self.SCHEMA)
+        self.known = {}
+        self.seen = {}
+
+    def unchanged(self, path):
+        """Returns True if path is recorded as conforming and hasn't changed since."""
+        if self.metadata:
+            return False
+        stat = os.stat(path)
+        row = self.connection.execute(
+            "SELECT inode, mtime_ns FROM directories WHERE key = ? AND path = ?", (self.key, path)
+        ).fetchone()
+        return row == (stat.st_ino, stat.st_mtime_ns)
+
+    def mark(self, path):
+        """Records path as conforming in its current state."""
+        if self.metadata:
+            return
+        stat = os.stat(path)
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO directories (key, path, inode, mtime_ns) VALUES (?, ?, ?, ?)",
+                (self.key, path, stat.st_ino, stat.st_mtime_ns)
+            )
+
+    def _entries(self, directory):
+        try:
+            return self.known[directory], self.seen[directory]
+        except KeyError:
+            rows = self.connection.execute(
+                "SELECT inode, mtime_ns, size, name FROM entries WHERE key = ? AND directory = ?",
+                (self.key, directory)
+            )
+            self.known[directory], self.seen[directory] = set(rows), set()
+            return self.known[directory], self.seen[directory]
+
+    @staticmethod
+    def _item(entry):
+        try:
+            stat = entry.stat()
+        except OSError:
+            return None
+        return entry.inode(), stat.st_mtime_ns, stat.st_size, entry.name
+
+    def conforms(self, entry):
+        """Returns True if the os.DirEntry conformed in an earlier run and hasn't changed since."""
+        known, seen = self._entries(os.path.dirname(entry.path))
+        item = self._item(entry)
+        if item in known:
+            seen.add(item)
+            return True
+        return False
+
+    def add(self, entry):
+        """Records the os.DirEntry as conforming."""
+        item = self._item(entry)
+        if item is not None:
+            self._entries(os.path.dirname(entry.path))[1].add(item)
+
+    def commit(self):
+        """Replaces the recorded entries of every directory seen in this run."""
+        with self.connection:
+            for directory, seen in self.seen.items():
+                self.connection.execute(
+                    "DELETE FROM entries WHERE key = ? AND directory = ?", (self.key, directory)
+                )
+                self.connection.executemany(
+                    "INSERT INTO entries (key, directory, inode, mtime_ns, size, name) VALUES (?, ?, ?, ?, ?, ?)",
+                    ((self.key, directory, *item) for item in seen)
+                )
+        self.known.clear()
+        self.seen.clear()
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,116 @@
+"""
+MIT License
+
+Copyright (c) 2020-2021 Euphyzr
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+class Stats:
+    """Per-phase wall time and counters of a batch of rename.
+
+    Phases can nest, like the scan running inside the transform which runs inside the
+    planning, and every moment is only counted towards the innermost phase running.
+
+    Attributes
+    ----------
+    phases : dict, attribute
+        Seconds spent in every phase, in order of first appearance.
+    counts : collections.Counter, attribute
+        Counters like entries, matches, renames, skips and errors.
+    latencies : collections.Counter, attribute
+        Histogram of rename latencies, the number of renames taking less than 2 ** bucket microseconds.
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self.counts = Counter()
+        self.latencies = Counter()
+        self._stack = []
+        self._since = None
+
+    def _enter(self, name):
+        now = time.perf_counter()
+        if self._stack:
+            self.phases[self._stack[-1]] += now - self._since
+        self.phases.setdefault(name, 0.0)
+        self._stack.append(name)
+        self._since = now
+
+    def _exit(self):
+        now = time.perf_counter()
+        self.phases[self._stack.pop()] += now - self._since
+        self._since = now
+
+    @contextmanager
+    def phase(self, name):
+        """Times the enclosed block as the name phase."""
+        self._enter(name)
+        try:
+            yield
+        finally:
+            self._exit()
+
+    def counted(self, name, iterable):
+        """Yields from iterable, counting every item under name."""
+        for item in iterable:
+            self.counts[name] += 1
+            yield item
+
+    def track(self, name, iterable):
+        """Yields from iterable, timing the production of every item as the name phase."""
+        iterator = iter(iterable)
+        while True:
+            self._enter(name)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self._exit()
+            yield item
+
+    def latency(self, seconds):
+        """Records the latency of a single rename."""
+        self.latencies[int(seconds * 1e6).bit_length()] += 1
+
+    def as_dict(self):
+        return {
+            'phases': dict(self.phases),
+            'counts': dict(self.counts),
+            'latency_us': {f'<{1 << bucket}': count for bucket, count in sorted(self.latencies.items())},
+        }
+
+    def summary(self):
+        """Returns a human readable summary."""
+        lines = ["Phases:"]
+        lines.extend(f"  {name:<16} {seconds:10.4f}s" for name, seconds in self.phases.items())
+        lines.append("Counts:")
+        lines.extend(f"  {name:<16} {count}" for name, count in self.counts.items())
+        if self.latencies:
+            lines.append("Rename latency:")
+            lines.extend(
+                f"  <{1 << bucket:>8}us {count}" for bucket, count in sorted(self.latencies.items())
+            )
+        return '\n'.join(lines)
@@ -0,0 +1,127 @@
+"""
+MIT License
+
+Copyright (c) 2020-2021 Euphyzr
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import os
+import re
+
+_TOKEN = re.compile(r'\{\{|\}\}|\{(n|mtime|ctime|size|parent|hash)(?::([^{}]*))?\}')
+
+def _date(timestamp, spec):
+    import datetime
+    return format(datetime.datetime.fromtimestamp(timestamp), spec or '%Y-%m-%d')
+
+class Template:
+    """A replacement with metadata tokens, parsed once and evaluated per entry.
+
+    Tokens are written like {name} or {name:format}, the format being a format spec
+    or a strftime format for dates. Everything else, backreferences included, works
+    like a plain replacement. {{ and }} stand for literal braces.
+
+    {n}         a counter of the renamed entries, starting at 1, like {n:05d}
+    {mtime}     the modification date, %Y-%m-%d if no format is given, like {mtime:%Y%m%d}
+    {ctime}     the metadata change date on Unix, the creation date on Windows
+    {size}      the size in bytes
+    {parent}    the name of the directory the entry is in
+    {hash}      the digest of the contents, for entries from EZrename.hashed_files, like {hash:.16}
+
+    Only the tokens in the template are evaluated, and only for entries the regex matches.
+    Dates and size use the entry's stat(), which os.DirEntry caches, so the entry is
+    stat-ed once at most, and not at all if a filter did it already.
+
+    Attributes
+    ----------
+    text : str
+        The template.
+    static : bool, attribute
+        If there aren't any tokens, so the replacement is the same for every entry.
+    count : int, attribute
+        The value of the last {n}.
+    tokens : set, attribute
+        The names of the tokens in the template.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.parts = []
+        self.count = 0
+        literal = []
+        position = 0
+        for match in _TOKEN.finditer(text):
+            literal.append(text[position:match.start()])
+            position = match.end()
+            if match.group(1):
+                self.parts.append((''.join(literal), match.group(1), match.group(2) or ''))
+                literal = []
+            else:
+                literal.append(match.group()[0])
+        literal.append(text[position:])
+        self.tail = ''.join(literal)
+        self.static = not self.parts
+        self.tokens = {token for literal, token, spec in self.parts}
+
+    def _value(self, token, spec, entry):
+        if token == 'n':
+            return format(self.count, spec)
+        if token == 'parent':
+            return format(os.path.basename(os.path.dirname(entry.path)), spec)
+        if token == 'hash':
+            digest = getattr(entry, 'digest', None)
+            if digest is None:
+                raise ValueError("{hash} needs the entries to come from EZrename.hashed_files.")
+            return format(digest, spec)
+        stat = entry.stat()
+        if token == 'size':
+            return format(stat.st_size, spec)
+        return _date(stat.st_mtime if token == 'mtime' else stat.st_ctime, spec)
+
+    def expand(self, entry):
+        """Returns the replacement for entry, with its tokens evaluated."""
+        self.count += 1
+        pieces = []
+        for literal, token, spec in self.parts:
+            pieces.append(literal)
+            # the result still goes through the backreference expansion of re
+            pieces.append(self._value(token, spec, entry).replace('\\', r'\\'))
+        pieces.append(self.tail)
+        return ''.join(pieces)
+
+    def replacement(self, entry):
+        """Returns the replacement of entry for re.sub, only evaluated on the first match."""
+        if self.static:
+            return self.tail
+        expanded = None
+
+        def replace(match):
+            nonlocal expanded
+            if expanded is None:
+                expanded = self.expand(entry)
+            return match.expand(expanded)
+
+        return replace
+
+
+def compile_template(replace_with):
+    """Returns replace_with as a Template, as is if it already is one."""
+    return replace_with if isinstance(replace_with, Template) else Template(replace_with)
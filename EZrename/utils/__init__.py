@@ -1,3 +1,4 @@
 """"EZrename command-line tool utilities."""
 from .confighandler import ConfigHandler
-from .pathhandler import PathHandler
\ No newline at end of file
+from .pathhandler import PathHandler
+from .historystore import JSONHistory, SQLiteHistory
\ No newline at end of file
@@ -22,11 +22,73 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
+import os
 import sys
 import json
+import tempfile
+import contextlib
+
+from .historystore import JSONHistory, SQLiteHistory
+
+_MISSING = object()
+
+@contextlib.contextmanager
+def locked(lockfile):
+    """Holds an exclusive lock on lockfile, created if needed, waiting for other processes holding it."""
+    with open(lockfile, 'a+b') as lfp:
+        if os.name == 'nt':
+            import msvcrt
+            lfp.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lfp.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after 10 seconds
+                    continue
+            try:
+                yield
+            finally:
+                lfp.seek(0)
+                msvcrt.locking(lfp.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(lfp.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lfp.fileno(), fcntl.LOCK_UN)
+
+def write_atomic(path, text):
+    """Writes text into path through a temporary file renamed over it, so path is
+    either left as it was or holds all of text, even if the process is killed."""
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, temp = tempfile.mkstemp(prefix=f'.{name}.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as tfp:
+            tfp.write(text)
+            tfp.flush()
+            os.fsync(tfp.fileno())
+        try:
+            mode = os.stat(path).st_mode & 0o7777
+        except FileNotFoundError:
+            # mkstemp makes the file private, a new one gets the permissions of any other file
+            umask = os.umask(0)
+            os.umask(umask)
+            mode = 0o666 & ~umask
+        os.chmod(temp, mode)
+        os.replace(temp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temp)
+        raise
 
 class ConfigHandler:
     """A helper class for EZrename command-line tool configuration.
+
+    Nothing is read until it's used, the json file on the first access of jsdata or
+    presets and the history store on the first access of history, so short commands
+    don't pay for loading what they don't need.
     
     Attributes
     ----------
@@ -38,10 +100,23 @@ class ConfigHandler:
         Function called for errors. sys.exit by default.
     limit : int, optional
         Maximum number of presets.
+    history_backend : str, optional
+        Where rename history is kept, 'sqlite' (default) or 'json'.
+    history_file : str, optional
+        The SQLite database for the 'sqlite' history backend. Defaults to history.sqlite3
+        in the statedir.
+    statedir : str, optional
+        The directory keeping the history database, journals and caches. Defaults to the
+        directory of the json file.
+    defaults : str, optional
+        A json file read instead of the json file until it's first dumped, such as the
+        configuration shipped with the package for a new statedir.
     jsdata : dict, attribute
         The entire json data.
     presets : dict, attribute
         The presets dictionary
+    history : JSONHistory or SQLiteHistory, attribute
+        The rename history store.
     """
 
     def __init__(self, jsonfile, **kwargs):
@@ -50,11 +125,56 @@ class ConfigHandler:
         self.jsonfile = jsonfile
         self.errorer = kwargs.pop('errorer', sys.exit)
         self.restriction_msg = kwargs.get('restriction_msg', f"Max {self.limit} presets allowed.")
+        self.statedir = kwargs.pop('statedir', None) or os.path.dirname(os.path.abspath(jsonfile))
+        self.defaults = kwargs.pop('defaults', None)
+
+        self.history_backend = kwargs.pop('history_backend', 'sqlite')
+        if self.history_backend not in ('json', 'sqlite'):
+            raise ValueError(f"Unknown history backend {self.history_backend!r}.")
+        self.history_file = kwargs.pop('history_file', None) or os.path.join(self.statedir, 'history.sqlite3')
+        self._jsdata = None
+        self._loaded = None
+        self._history = None
+
+    def _read(self):
+        try:
+            with open(self.jsonfile, 'r') as jfp:
+                return jfp.read()
+        except FileNotFoundError:
+            if not self.defaults:
+                raise
+            with open(self.defaults, 'r') as jfp:
+                return jfp.read()
 
-        with open(jsonfile, 'r') as jfp:
-            self.jsdata = json.load(jfp)
-        self.presets = self.jsdata.get('presets', {})
-        self.history = self.jsdata.get('last_changes', {})
+    @property
+    def jsdata(self):
+        if self._jsdata is None:
+            text = self._read()
+            self._jsdata = json.loads(text)
+            # what was loaded, so dump can tell what changed here from what other processes changed
+            self._loaded = json.loads(text)
+        return self._jsdata
+
+    @property
+    def presets(self):
+        return self.jsdata.setdefault('presets', {})
+
+    @property
+    def history(self):
+        if self._history is None:
+            changes = self.jsdata.setdefault('last_changes', {})
+            if self.history_backend == 'json':
+                self._history = JSONHistory(changes)
+            else:
+                self._history = SQLiteHistory(self.history_file)
+                if changes:
+                    # move the history of older configurations into the database
+                    for path, batches in changes.items():
+                        for batch in [batches] if isinstance(batches, dict) else batches:
+                            self._history.add_batch(path, batch)
+                    changes.clear()
+                    self.dump()
+        return self._history
 
     def update_preset(self, new):
         if self.limit and (len(self.presets) + len(new) > self.limit):
@@ -62,10 +182,50 @@ class ConfigHandler:
             return
         self.presets.update(new)
 
+    def _merge(self, current):
+        """Applies what changed here since loading onto current, key by key, and one level
+        down for dictionaries like presets or last_changes so every path merges on its own."""
+        loaded = self._loaded
+        for key, value in self._jsdata.items():
+            old = loaded.get(key, _MISSING)
+            if isinstance(value, dict) and isinstance(old, dict) and isinstance(current.get(key), dict):
+                target = current[key]
+                for subkey, subvalue in value.items():
+                    if old.get(subkey, _MISSING) != subvalue:
+                        target[subkey] = subvalue
+                for subkey in old.keys() - value.keys():
+                    target.pop(subkey, None)
+            elif old != value:
+                current[key] = value
+        for key in loaded.keys() - self._jsdata.keys():
+            current.pop(key, None)
+        return current
+
     def dump(self, **kwargs):
-        """Dump the datas to the json file."""
-        with open(self.jsonfile, 'w') as jfp:
-            json.dump(self.jsdata, jfp, indent=self.indent, **kwargs)
+        """Dump the datas to the json file, if they were loaded.
+
+        The file is read again under a lock and only what changed here is written over it,
+        atomically, so parallel invocations don't lose each other's changes. jsdata is then
+        brought up to date with theirs.
+        """
+        if self._jsdata is None:
+            return
+        with locked(self.jsonfile + '.lock'):
+            current = self._merge(json.loads(self._read()))
+            text = json.dumps(current, indent=self.indent, **kwargs)
+            write_atomic(self.jsonfile, text)
+
+        # update in place, the history store may hold on to last_changes
+        for key in self._jsdata.keys() - current.keys():
+            del self._jsdata[key]
+        for key, value in current.items():
+            mine = self._jsdata.get(key)
+            if isinstance(mine, dict) and isinstance(value, dict):
+                mine.clear()
+                mine.update(value)
+            else:
+                self._jsdata[key] = value
+        self._loaded = json.loads(text)
 
     
     def get_regex(self, regex=None, preset_regex=None):
@@ -96,11 +256,29 @@ class ConfigHandler:
 
         return result
     
-    def get_history(self, path):
-        """Returns rename history for the provided path."""
-        try:
-            history = self.history[path].items()
-        except KeyError as e:
-            self.errorer(f"No rename history for {e}.")
+    def journal_path(self, path):
+        """Returns the path of the write-ahead journal for renames in the provided path."""
+        import hashlib
+        digest = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()
+        return os.path.join(self.statedir, 'journals', f'{digest}.jsonl')
+
+    def add_history(self, path, history):
+        """Records a batch of (new_name: original) renames of path."""
+        if history:
+            self.history.add_batch(path, history)
+
+    def get_history(self, path, count=1):
+        """Returns rename history of the last count batches for the provided path. Batches
+        come latest first and each one yields its (new_name, original) latest rename first.
+
+        Undoing in reverse order matters for recursive renames, where a directory
+        is renamed after its contents and so has to be restored before them. Batches
+        have to be undone one after another, as they may rename the same files.
+        """
+        available = self.history.count(path)
+        if not available:
+            self.errorer(f"No rename history for '{path}'.")
+        elif count > available:
+            self.errorer(f"Only {available} batch(es) of rename history for '{path}'.")
 
-        return history
+        return self.history.get_batches(path, count)
@@ -0,0 +1,274 @@
+"""
+MIT License
+
+Copyright (c) 2020-2021 Euphyzr
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import time
+
+def _absolute(path):
+    """Returns path as an absolute path and a function making the paths of its renames absolute.
+
+    Renames are recorded with paths starting with path as it was typed, so their prefix is
+    swapped rather than normalizing every one of them. Others, like the targets of --dest,
+    are normalized.
+    """
+    base = os.path.abspath(path)
+    prefix, absolute_prefix = os.path.join(path, ''), os.path.join(base, '')
+
+    def absolute(filepath):
+        if filepath.startswith(prefix):
+            return absolute_prefix + filepath[len(prefix):]
+        return os.path.abspath(filepath)
+
+    return base, absolute
+
+def _ancestors(filepath):
+    """Returns filepath and every directory above it."""
+    paths = [filepath]
+    while True:
+        parent = os.path.dirname(filepath)
+        if parent == filepath:
+            return paths
+        paths.append(parent)
+        filepath = parent
+
+def _undo(filepath, new_name, original):
+    """Returns what filepath was called before new_name was renamed from original, which may be
+    filepath itself or one of its directories."""
+    if filepath == new_name:
+        return original
+    if filepath.startswith(os.path.join(new_name, '')):
+        return original + filepath[len(new_name):]
+    return filepath
+
+class JSONHistory:
+    """Rename history kept in the 'last_changes' of the configuration json.
+
+    Every batch lives in memory and is written with the rest of the configuration,
+    so this is only suited for small histories. Directories and renames are kept as
+    absolute paths, so they can be looked up from anywhere.
+
+    Attributes
+    ----------
+    changes : dict
+        The 'last_changes' dictionary, mapping a directory to its list of batches.
+    """
+
+    def __init__(self, changes):
+        self.changes = changes
+
+    def _batches(self, path):
+        batches = self.changes.get(os.path.abspath(path), [])
+        # older configurations kept a single batch per directory
+        return [batches] if isinstance(batches, dict) else batches
+
+    def add_batch(self, path, history):
+        """Appends a batch of (new_name: original) renames of path."""
+        base, absolute = _absolute(path)
+        batch = {absolute(new_name): absolute(original) for new_name, original in history.items()}
+        self.changes[base] = self._batches(path) + [batch]
+
+    def count(self, path):
+        """Returns the number of batches of path."""
+        return len(self._batches(path))
+
+    def get_batches(self, path, count=1):
+        """Yields the last count batches of path, latest first, as lists of (new_name, original)
+        in reverse order of renaming."""
+        for batch in self._batches(path)[::-1][:count]:
+            yield list(batch.items())[::-1]
+
+    def drop_batches(self, path, count=1):
+        """Forgets the last count batches of path."""
+        batches = self._batches(path)[:-count]
+        if batches:
+            self.changes[os.path.abspath(path)] = batches
+        else:
+            self.changes.pop(os.path.abspath(path), None)
+
+    def drop_renames(self, path, new_names):
+        """Forgets the renames into new_names of the last batch of path, and the batch if that was all of it."""
+        batches = self._batches(path)
+        if not batches:
+            return
+        new_names = {os.path.abspath(new_name) for new_name in new_names}
+        batch = {new_name: original for new_name, original in batches[-1].items() if new_name not in new_names}
+        if batch:
+            self.changes[os.path.abspath(path)] = batches[:-1] + [batch]
+        else:
+            self.drop_batches(path)
+
+    def list_batches(self, path):
+        """Returns (batch, created, renames) of every batch of path, latest first."""
+        batches = self._batches(path)
+        return [(number, None, len(batches[number - 1])) for number in range(len(batches), 0, -1)]
+
+    def original_name(self, filepath):
+        """Returns what filepath was called before any of the recorded renames, following the
+        renames of its directories too."""
+        filepath = os.path.abspath(filepath)
+        for batches in self.changes.values():
+            batches = [batches] if isinstance(batches, dict) else batches
+            for batch in batches[::-1]:
+                for new_name, original in reversed(batch.items()):
+                    filepath = _undo(filepath, new_name, original)
+        return filepath
+
+    def close(self):
+        pass
+
+
+class SQLiteHistory:
+    """Rename history kept in an SQLite database.
+
+    Batches are appended incrementally and indexed by directory and by new name,
+    so neither recording nor undoing a batch needs to load the whole history.
+    Directories and renames are kept as absolute paths, so they can be looked up
+    from anywhere.
+
+    Attributes
+    ----------
+    dbfile : str
+        The path to the database file.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS batches (
+            id INTEGER PRIMARY KEY,
+            directory TEXT NOT NULL,
+            created REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS batches_directory ON batches (directory, id);
+        CREATE TABLE IF NOT EXISTS renames (
+            batch INTEGER NOT NULL REFERENCES batches (id) ON DELETE CASCADE,
+            seq INTEGER NOT NULL,
+            original TEXT NOT NULL,
+            new_name TEXT NOT NULL,
+            PRIMARY KEY (batch, seq)
+        );
+        CREATE INDEX IF NOT EXISTS renames_new_name ON renames (new_name, batch);
+    """
+
+    def __init__(self, dbfile):
+        import sqlite3
+
+        self.dbfile = dbfile
+        # callers sharing the store between threads serialize access to it themselves, other
+        # processes are waited for: every batch is a transaction of its own, so parallel
+        # invocations append to the one history without overwriting each other
+        self.connection = sqlite3.connect(dbfile, timeout=60, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(self.SCHEMA)
+
+    def _batch_ids(self, path, count=-1):
+        rows = self.connection.execute(
+            "SELECT id FROM batches WHERE directory = ? ORDER BY id DESC LIMIT ?", (os.path.abspath(path), count)
+        )
+        return [batch for batch, in rows]
+
+    def add_batch(self, path, history):
+        """Appends a batch of (new_name: original) renames of path."""
+        base, absolute = _absolute(path)
+        with self.connection:
+            batch = self.connection.execute(
+                "INSERT INTO batches (directory, created) VALUES (?, ?)", (base, time.time())
+            ).lastrowid
+            self.connection.executemany(
+                "INSERT INTO renames (batch, seq, original, new_name) VALUES (?, ?, ?, ?)",
+                (
+                    (batch, seq, absolute(original), absolute(new_name))
+                    for seq, (new_name, original) in enumerate(history.items())
+                )
+            )
+
+    def count(self, path):
+        """Returns the number of batches of path."""
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM batches WHERE directory = ?", (os.path.abspath(path),)
+        ).fetchone()[0]
+
+    def get_batches(self, path, count=1):
+        """Yields the last count batches of path, latest first, as cursors of (new_name, original)
+        in reverse order of renaming."""
+        for batch in self._batch_ids(path, count):
+            yield self.connection.execute(
+                "SELECT new_name, original FROM renames WHERE batch = ? ORDER BY seq DESC", (batch,)
+            )
+
+    def drop_batches(self, path, count=1):
+        """Forgets the last count batches of path."""
+        with self.connection:
+            self.connection.executemany(
+                "DELETE FROM batches WHERE id = ?", ((batch,) for batch in self._batch_ids(path, count))
+            )
+
+    def drop_renames(self, path, new_names):
+        """Forgets the renames into new_names of the last batch of path, and the batch if that was all of it."""
+        for batch in self._batch_ids(path, 1):
+            with self.connection:
+                self.connection.executemany(
+                    "DELETE FROM renames WHERE batch = ? AND new_name = ?",
+                    ((batch, os.path.abspath(new_name)) for new_name in new_names)
+                )
+                self.connection.execute(
+                    "DELETE FROM batches WHERE id = ? AND NOT EXISTS (SELECT 1 FROM renames WHERE batch = ?)",
+                    (batch, batch)
+                )
+
+    def list_batches(self, path):
+        """Returns (batch, created, renames) of every batch of path, latest first."""
+        return self.connection.execute(
+            "SELECT batches.id, batches.created, COUNT(renames.seq) FROM batches"
+            " LEFT JOIN renames ON renames.batch = batches.id WHERE directory = ?"
+            " GROUP BY batches.id ORDER BY batches.id DESC", (os.path.abspath(path),)
+        ).fetchall()
+
+    def original_name(self, filepath):
+        """Returns what filepath was called before any of the recorded renames, following the
+        renames of its directories too."""
+        filepath = os.path.abspath(filepath)
+        batch = seq = None
+        while True:
+            # the latest earlier rename into filepath or into one of its directories
+            ancestors = _ancestors(filepath)
+            row = self.connection.execute(
+                "SELECT new_name, original, batch, seq FROM renames"
+                f" WHERE new_name IN ({', '.join('?' * len(ancestors))})"
+                " AND (? IS NULL OR batch < ? OR (batch = ? AND seq < ?))"
+                " ORDER BY batch DESC, seq DESC LIMIT 1", (*ancestors, batch, batch, batch, seq)
+            ).fetchone()
+            if row is None:
+                return filepath
+            new_name, original, batch, seq = row
+            filepath = _undo(filepath, new_name, original)
+
+    def size(self):
+        """Returns the size of the database in bytes, counting the pages still in the
+        write-ahead log, which the database file only grows by once they're checkpointed."""
+        pages, = self.connection.execute("PRAGMA page_count").fetchone()
+        page_size, = self.connection.execute("PRAGMA page_size").fetchone()
+        return pages * page_size
+
+    def close(self):
+        self.connection.close()
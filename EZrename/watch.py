@@ -0,0 +1,222 @@
+"""
+MIT License
+
+Copyright (c) 2020-2021 Euphyzr
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import os
+import time
+import select
+import struct
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT = struct.Struct('iIII')
+
+class Arrival:
+    """An os.DirEntry lookalike of a new entry, so it can go through get_files predicates
+    and renamed_files without scanning its directory."""
+
+    __slots__ = ('name', 'path', '_is_dir', '_stat')
+
+    def __init__(self, directory, name, is_dir=None):
+        self.name = name
+        self.path = os.path.join(directory, name)
+        self._is_dir = is_dir
+        self._stat = None
+
+    def stat(self, follow_symlinks=True):
+        if self._stat is None:
+            self._stat = os.stat(self.path, follow_symlinks=follow_symlinks)
+        return self._stat
+
+    def is_dir(self, follow_symlinks=True):
+        if self._is_dir is None:
+            self._is_dir = os.path.isdir(self.path)
+        return self._is_dir
+
+    def __repr__(self):
+        return f'<Arrival {self.name!r}>'
+
+
+def _arrivals(path):
+    """Returns every entry of path as an Arrival."""
+    with os.scandir(path) as it:
+        return [Arrival(path, entry.name, entry.is_dir()) for entry in it]
+
+
+class Inotify:
+    """New entries of a directory from Linux inotify. Raises OSError where it isn't available.
+
+    A file created in the directory is only taken once it's written and closed, and a write
+    to a file which was there before the watch doesn't make it new.
+    """
+
+    def __init__(self, path):
+        import ctypes
+        import ctypes.util
+
+        self.path = path
+        # files created during the watch which haven't been written and closed yet
+        self.created = set()
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        try:
+            init, add_watch = libc.inotify_init1, libc.inotify_add_watch
+        except AttributeError:
+            raise OSError("inotify isn't available.") from None
+        self.fd = init(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "Can't start inotify.")
+        # files are only taken once they're written, directories and symlinks when created
+        if add_watch(self.fd, os.fsencode(path), IN_CREATE | IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"Can't watch '{path}'.")
+
+    def read(self, timeout=None):
+        """Returns the entries which arrived, waiting at most timeout seconds for any."""
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return []
+
+        arrivals = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = _EVENT.unpack_from(data, offset)
+            name = os.fsdecode(data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b'\0'))
+            offset += _EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                # events were lost, everything has to be looked at again
+                return _arrivals(self.path)
+            if mask & IN_CREATE and not mask & IN_ISDIR and not os.path.islink(os.path.join(self.path, name)):
+                self.created.add(name)
+                continue
+            if mask & IN_CLOSE_WRITE:
+                if name not in self.created:
+                    continue
+                self.created.discard(name)
+            arrivals.append(Arrival(self.path, name, bool(mask & IN_ISDIR)))
+        return arrivals
+
+    def close(self):
+        os.close(self.fd)
+
+
+class Poller:
+    """New entries of a directory, found by comparing listings every interval seconds."""
+
+    def __init__(self, path, interval=2.0):
+        self.path = path
+        self.interval = interval
+        self.names = {entry.name for entry in _arrivals(path)}
+
+    def read(self, timeout=None):
+        """Returns the entries which arrived, waiting at most timeout seconds for any."""
+        time.sleep(self.interval if timeout is None else min(timeout, self.interval))
+        entries = _arrivals(self.path)
+        names = {entry.name for entry in entries}
+        arrivals = [entry for entry in entries if entry.name not in self.names]
+        self.names = names
+        return arrivals
+
+    def close(self):
+        pass
+
+
+class Watcher:
+    """Yields the new entries of a directory in small batches, as they arrive.
+
+    Entries which already exist are left alone. Arrivals are collected until none came for
+    delay seconds or max_batch of them are waiting, and entries which are gone by then are
+    dropped. Linux inotify is used where available, with a polling fallback, so the cost
+    follows the arrivals rather than the size of the directory.
+
+    Attributes
+    ----------
+    path : str
+        The directory to watch. Its subdirectories aren't watched.
+    delay : float, optional
+        Seconds without arrivals closing a batch. 0.5 by default.
+    max_batch : int, optional
+        Maximum number of entries in a batch. 1000 by default.
+    interval : float, optional
+        Seconds between listings of the polling fallback. 2 by default.
+    poll : bool, optional
+        Polls even if inotify is available.
+    """
+
+    def __init__(self, path, delay=0.5, max_batch=1000, interval=2.0, poll=False):
+        self.path = path
+        self.delay = delay
+        self.max_batch = max_batch
+        self.source = None
+        if not poll:
+            try:
+                self.source = Inotify(path)
+            except OSError:
+                pass
+        if self.source is None:
+            self.source = Poller(path, interval)
+        self.own = set()
+
+    def renamed(self, new_names):
+        """Notes the names renamed into by the watcher's user, so they don't come back as arrivals."""
+        self.own.update(os.path.basename(new_name) for new_name in new_names)
+
+    def batches(self):
+        """Yields every batch of new entries, as a list of Arrival."""
+        pending = {}
+        quiet = None
+        while True:
+            count = len(pending)
+            for arrival in self.source.read(None if quiet is None else max(quiet - time.monotonic(), 0)):
+                if arrival.name in self.own:
+                    self.own.discard(arrival.name)
+                else:
+                    pending[arrival.name] = arrival
+            if len(pending) > count:
+                quiet = time.monotonic() + self.delay
+            if not pending or (time.monotonic() < quiet and len(pending) < self.max_batch):
+                continue
+
+            batch = [arrival for arrival in pending.values() if os.path.lexists(arrival.path)]
+            pending = {}
+            quiet = None
+            if batch:
+                yield batch
+
+    def close(self):
+        self.source.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
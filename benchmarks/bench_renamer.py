@@ -0,0 +1,128 @@
+"""
+Benchmarks every stage of a batch of rename on synthetic directories.
+
+usage: python benchmarks/bench_renamer.py [--sizes N [N ...]] [--tree] [--dir DIR] [--memory]
+                                          [--save FILE] [--compare FILE]
+
+Stages are timed separately, each reporting its wall time, throughput and, with --memory,
+its peak of traced memory. Results can be saved as a baseline and later runs compared
+against it, to see a regression in any stage as a number. Point --dir to a tmpfs, like
+/dev/shm, to leave the disk out of the numbers.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import EZrename
+from EZrename.utils import ConfigHandler
+
+STAGES = ['scan', 'transform', 'rename', 'history', 'dump', 'undo']
+
+def generate(path, size, tree=False):
+    """Creates size empty files in path, in subdirectories of 1000 files if tree."""
+    os.makedirs(path)
+    for number in range(size):
+        directory = os.path.join(path, f'dir{number // 1000}') if tree else path
+        if tree and number % 1000 == 0:
+            os.mkdir(directory)
+        open(os.path.join(directory, f'file{number}_2021.txt'), 'w').close()
+
+
+def measure(stage, results, memory, function, *args):
+    """Runs function, recording its wall time and peak memory under stage."""
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    output = function(*args)
+    elapsed = time.perf_counter() - start
+    results[stage] = {'seconds': elapsed}
+    if memory:
+        results[stage]['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return output
+
+
+def bench(workdir, size, tree=False, memory=False):
+    """Returns the results of every stage for a directory of size entries."""
+    path = os.path.join(workdir, f'bench{size}')
+    generate(path, size, tree)
+    shutil.copy(os.path.join(os.path.dirname(EZrename.__file__), 'config.json'), workdir)
+    conf = ConfigHandler(os.path.join(workdir, 'config.json'), history_file=os.path.join(workdir, f'history{size}.sqlite3'))
+    quiet = lambda original, new_name: None
+    results = {}
+
+    files = measure('scan', results, memory, lambda: list(EZrename.get_files(path, recursive=tree)))
+    source = measure('transform', results, memory, lambda: list(EZrename.renamed_files(path, files, r'_2021', '')))
+    history = measure('rename', results, memory, lambda: EZrename.rename(source, on_rename=quiet))
+    measure('history', results, memory, conf.add_history, path, history)
+    measure('dump', results, memory, conf.dump)
+    measure('undo', results, memory, lambda: EZrename.rename(next(conf.get_history(path)), on_rename=quiet))
+
+    for stage, result in results.items():
+        result['per_second'] = size / result['seconds'] if result['seconds'] else None
+    conf.history.close()
+    shutil.rmtree(path)
+    return results
+
+
+def report(all_results, baseline=None, threshold=1.25):
+    """Prints the results, compared to baseline if given. Returns the number of regressions."""
+    regressions = 0
+    print(f"{'size':>9} {'stage':<10} {'seconds':>9} {'entries/s':>12} {'peak MiB':>9}  vs baseline")
+    for size, results in all_results.items():
+        for stage in STAGES:
+            result = results[stage]
+            peak = f"{result['peak_bytes'] / (1 << 20):9.1f}" if 'peak_bytes' in result else f"{'-':>9}"
+            line = f"{size:>9} {stage:<10} {result['seconds']:9.4f} {result['per_second'] or 0:12.0f} {peak}"
+            try:
+                previous = baseline[size][stage]['seconds']
+            except (TypeError, KeyError):
+                print(line)
+                continue
+            ratio = result['seconds'] / previous if previous else 1
+            regressed = ratio > threshold
+            regressions += regressed
+            print(f"{line}  x{ratio:.2f}{' REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks EZrename stage by stage.")
+    parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000, 100000],
+                        help="Number of entries of each synthetic directory, up to 1000000.")
+    parser.add_argument('--tree', action='store_true', help="Spreads entries over subdirectories and scans recursively.")
+    parser.add_argument('--dir', help="Where to generate the directories. Defaults to a temporary directory.")
+    parser.add_argument('--memory', action='store_true', help="Traces the peak memory of each stage, which slows it down.")
+    parser.add_argument('--save', metavar='FILE', help="Saves the results as a baseline.")
+    parser.add_argument('--compare', metavar='FILE', help="Compares the results to a saved baseline.")
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help="How many times slower than the baseline counts as a regression. Defaults to 1.25.")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='ezrename-bench-', dir=args.dir)
+    try:
+        all_results = {str(size): bench(workdir, size, args.tree, args.memory) for size in args.sizes}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)['results']
+    regressions = report(all_results, baseline, args.threshold)
+
+    if args.save:
+        with open(args.save, 'w') as fp:
+            json.dump({'python': sys.version.split()[0], 'tree': args.tree, 'results': all_results}, fp, indent=4)
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import asyncio
+import re
+import os
+
+import pytest
+
+from EZrename import aio
+
+def test_pipeline(tmp_path):
+    for index in range(50):
+        (tmp_path / f'file{index}.txt').touch()
+    (tmp_path / 'file.txt').touch()
+    pipeline = aio.Pipeline(str(tmp_path), r'\d+', '', chunk_size=8, queue_size=1)
+
+    async def collect():
+        return [result async for result in pipeline]
+
+    results = asyncio.run(collect())
+    assert len(results) == len(pipeline.history) == 50
+    assert {new_name: original for original, new_name in results} == pipeline.history
+    # every chunk is planned after the earlier ones are renamed, so nothing is overwritten
+    assert len(os.listdir(tmp_path)) == 51
+    assert sorted(os.listdir(tmp_path))[:3] == ['file (1).txt', 'file (10).txt', 'file (11).txt']
+
+
+def test_pipeline_cancel(tmp_path):
+    for index in range(50):
+        (tmp_path / f'file{index}.txt').touch()
+    pipeline = aio.Pipeline(str(tmp_path), r'file', 'renamed', chunk_size=4, queue_size=1)
+
+    async def cancel():
+        results = pipeline.__aiter__()
+        await results.__anext__()
+        await results.aclose()
+
+    asyncio.run(cancel())
+    renamed = {os.path.join(tmp_path, name) for name in os.listdir(tmp_path) if name.startswith('renamed')}
+    assert 0 < len(renamed) < 50
+    assert set(pipeline.history) == renamed
+    assert asyncio.run(aio.rename(str(tmp_path), r'file', 'renamed')).keys() == {
+        os.path.join(tmp_path, name) for name in os.listdir(tmp_path)
+    } - renamed
+
+
+def test_pipeline_renames_once(tmp_path):
+    # the replacement matches again what it produced, so renaming an entry twice would show
+    for index in range(2000):
+        (tmp_path / f'{index}.txt').touch()
+    history = asyncio.run(aio.rename(str(tmp_path), r'^', 'x_', chunk_size=16))
+
+    assert len(history) == 2000
+    assert sorted(os.listdir(tmp_path)) == sorted(f'x_{index}.txt' for index in range(2000))
+
+
+def test_pipeline_failure(tmp_path):
+    for index in range(20):
+        (tmp_path / f'file{index}.txt').touch()
+
+    async def fail():
+        with pytest.raises(re.error):
+            await aio.rename(str(tmp_path), '(', '', chunk_size=2, queue_size=1)
+        # the stages which didn't fail are cancelled rather than left waiting on their queues
+        return [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+
+    assert asyncio.run(fail()) == []
+    assert len(os.listdir(tmp_path)) == 20
+
+
+def test_pipeline_lists_once(tmp_path, monkeypatch):
+    for index in range(100):
+        (tmp_path / f'{index}.txt').touch()
+    (tmp_path / 'x_0.txt').touch()
+    listdir = os.listdir
+    listed = []
+    monkeypatch.setattr(os, 'listdir', lambda path='.': listed.append(path) or listdir(path))
+
+    history = asyncio.run(aio.rename(str(tmp_path), r'^(?=\d)', 'x_', chunk_size=8))
+    assert listed == []
+    assert len(history) == 100
+    # the name taken before the pipeline started is still kept clear of
+    assert (tmp_path / 'x_0 (1).txt').exists() and len(os.listdir(tmp_path)) == 101
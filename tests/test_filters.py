@@ -0,0 +1,41 @@
+import os
+
+import pytest
+
+from EZrename import compile_filter, extension
+
+@pytest.mark.parametrize('name, expected', [
+    ('text.txt', 'txt'), ('archive.tar.gz', 'gz'), ('.bashrc', ''), ('..x', ''), ('dir', ''), ('a.', ''),
+])
+def test_extension(name, expected):
+    assert extension(name) == expected == os.path.splitext(name)[1][1:]
+
+
+@pytest.fixture()
+def entries(tmp_path):
+    (tmp_path / 'small.txt').write_bytes(b'x' * 10)
+    (tmp_path / 'big.txt').write_bytes(b'x' * 2000)
+    (tmp_path / 'IMG_001.jpg').write_bytes(b'x' * 500)
+    (tmp_path / 'folder').mkdir()
+    os.utime(tmp_path / 'small.txt', (1000, 1000))
+    return list(os.scandir(tmp_path))
+
+
+@pytest.mark.parametrize('flags, expected', [
+    ({'glob': ['IMG_*']}, ['IMG_001.jpg']),
+    ({'glob': ['*.jpg', 'small*']}, ['IMG_001.jpg', 'small.txt']),
+    ({'min_size': 100, 'directory': True, 'ignore': []}, ['IMG_001.jpg', 'big.txt']),
+    ({'max_size': 100, 'only': ['txt']}, ['small.txt']),
+    ({'older': 2000}, ['small.txt']),
+    ({'newer': 2000, 'ignore': ['jpg']}, ['big.txt', 'folder']),
+    ({'max_length': 7}, ['big.txt', 'folder']),
+    ({'min_length': 9, 'directory': True, 'only': ['txt']}, ['small.txt']),
+])
+def test_compile_filter(entries, flags, expected):
+    predicate = compile_filter(**flags)
+    assert sorted(entry.name for entry in entries if predicate(entry)) == expected
+
+
+def test_compile_filter_nothing():
+    assert compile_filter() is None
+    assert compile_filter(only=[], ignore=[]) is None
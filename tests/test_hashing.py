@@ -0,0 +1,36 @@
+import hashlib
+import os
+
+from EZrename import get_files, renamed_files, plan_renames, rename, hashed_files, HashCache
+from EZrename.hashing import STEM_REGEX
+
+def test_hashed_files(tmp_path):
+    target = tmp_path / 'target'
+    target.mkdir()
+    (target / 'dir').mkdir()
+    for name, content in [('a.txt', b'same'), ('b.txt', b'same'), ('c', b'other')]:
+        (target / name).write_bytes(content)
+    cache = HashCache(str(tmp_path / 'hashes.sqlite3'))
+    files = sorted(get_files(target), key=lambda entry: entry.name)
+
+    hashed = list(hashed_files(files, cache=cache, workers=2))
+    assert [(entry.name, entry.digest) for entry in hashed] == [
+        (name, hashlib.sha256(content).hexdigest()) for name, content in [('a.txt', b'same'), ('b.txt', b'same'), ('c', b'other')]
+    ]
+    cache.commit()
+    assert cache.get('sha256', (target / 'c').stat()) == hashlib.sha256(b'other').hexdigest()
+
+    same = hashlib.sha256(b'same').hexdigest()
+    rename(renamed_files(target, hashed_files(files, cache=cache), STEM_REGEX, '{hash}'), on_rename=lambda *names: None)
+    assert sorted(os.listdir(target)) == sorted([
+        f'{same}.txt', f'{same} (1).txt', hashlib.sha256(b'other').hexdigest(), 'dir'
+    ])
+    # a second run finds nothing to rename, the numbered duplicate included
+    assert plan_renames(renamed_files(target, hashed_files(get_files(target), cache=cache), STEM_REGEX, '{hash}')) == []
+
+
+def test_hashed_files_skips_unreadable(tmp_path):
+    (tmp_path / 'a.txt').write_text('a')
+    os.symlink(tmp_path / 'nowhere', tmp_path / 'broken')
+    hashed = list(hashed_files(get_files(str(tmp_path)), workers=1))
+    assert [(entry.name, entry.digest) for entry in hashed] == [('a.txt', hashlib.sha256(b'a').hexdigest())]
@@ -0,0 +1,157 @@
+import json
+import os
+
+import pytest
+
+from EZrename.utils import ConfigHandler, JSONHistory, SQLiteHistory
+
+@pytest.fixture(params=['json', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'json':
+        return JSONHistory({})
+    return SQLiteHistory(str(tmp_path / 'history.sqlite3'))
+
+
+def test_batches(store, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    absolute = lambda *paths: tuple(str(tmp_path / path) for path in paths)
+    store.add_batch('dir', {'dir/b': 'dir/a', 'dir/d': 'dir/c'})
+    store.add_batch('dir', {'dir/e': 'dir/b'})
+    store.add_batch('other', {'other/y': 'other/x'})
+
+    # paths are recorded absolute, so they can be looked up however they're written
+    assert store.count('dir') == store.count('./dir') == store.count(str(tmp_path / 'dir')) == 2
+    assert [list(batch) for batch in store.get_batches('dir', 2)] == [
+        [absolute('dir/e', 'dir/b')],
+        [absolute('dir/d', 'dir/c'), absolute('dir/b', 'dir/a')],
+    ]
+    assert store.original_name('dir/e') == str(tmp_path / 'dir/a')
+    assert store.original_name('./dir/d') == str(tmp_path / 'dir/c')
+
+    store.drop_batches('dir')
+    assert store.count('dir') == 1
+    assert store.original_name('dir/e') == str(tmp_path / 'dir/e')
+    assert store.count('other') == 1
+
+
+def test_original_name_of_renamed_directories(store, tmp_path):
+    # a recursive batch renames contents before their directories
+    store.add_batch(str(tmp_path), {
+        str(tmp_path / 'sub1/inner1/c'): str(tmp_path / 'sub1/inner1/c1'),
+        str(tmp_path / 'sub1/inner'): str(tmp_path / 'sub1/inner1'),
+        str(tmp_path / 'sub'): str(tmp_path / 'sub1'),
+    })
+    assert store.original_name(str(tmp_path / 'sub/inner/c')) == str(tmp_path / 'sub1/inner1/c1')
+    assert store.original_name(str(tmp_path / 'sub/inner/other')) == str(tmp_path / 'sub1/inner1/other')
+    assert store.original_name(str(tmp_path / 'subway')) == str(tmp_path / 'subway')
+
+
+def test_drop_renames(store, tmp_path):
+    path = str(tmp_path)
+    store.add_batch(path, {str(tmp_path / 'older'): str(tmp_path / 'old')})
+    store.add_batch(path, {str(tmp_path / 'b'): str(tmp_path / 'a'), str(tmp_path / 'd'): str(tmp_path / 'c')})
+    store.drop_renames(path, [str(tmp_path / 'b')])
+    assert store.count(path) == 2
+    assert [list(batch) for batch in store.get_batches(path)] == [[(str(tmp_path / 'd'), str(tmp_path / 'c'))]]
+    store.drop_renames(path, [str(tmp_path / 'd')])
+    assert [list(batch) for batch in store.get_batches(path)] == [[(str(tmp_path / 'older'), str(tmp_path / 'old'))]]
+
+
+def test_legacy_history_is_migrated(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    config = tmp_path / 'config.json'
+    config.write_text(json.dumps({
+        'regex_default': '', 'presets': {}, 'last_changes': {'dir': {'dir/b': 'dir/a'}}
+    }))
+    conf = ConfigHandler(str(config))
+
+    assert [list(batch) for batch in conf.get_history('dir')] == [[(str(tmp_path / 'dir/b'), str(tmp_path / 'dir/a'))]]
+    assert json.loads(config.read_text())['last_changes'] == {}
+
+
+def test_config_is_loaded_lazily(tmp_path):
+    conf = ConfigHandler(str(tmp_path / 'config.json'))
+    # nothing is read or written until it's needed
+    conf.dump()
+    assert list(tmp_path.iterdir()) == []
+    with pytest.raises(FileNotFoundError):
+        conf.presets
+
+
+def _add_preset(config, number):
+    conf = ConfigHandler(config, history_backend='json')
+    conf.presets[f'preset{number}'] = str(number)
+    conf.history.add_batch(f'dir{number}', {f'dir{number}/b': f'dir{number}/a'})
+    conf.dump()
+
+
+def test_parallel_dumps_merge(tmp_path):
+    import multiprocessing
+
+    config = tmp_path / 'config.json'
+    config.write_text(json.dumps({'regex_default': '', 'presets': {'kept': 'x'}, 'last_changes': {}}))
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=_add_preset, args=(str(config), number)) for number in range(8)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    data = json.loads(config.read_text())
+    assert data['presets'] == {'kept': 'x', **{f'preset{number}': str(number) for number in range(8)}}
+    assert sorted(data['last_changes']) == [os.path.abspath(f'dir{number}') for number in range(8)]
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['config.json', 'config.json.lock']
+
+
+def test_dump_keeps_other_changes(tmp_path):
+    config = tmp_path / 'config.json'
+    config.write_text(json.dumps({'regex_default': '', 'presets': {'a': '1', 'b': '2'}}))
+    first, second = ConfigHandler(str(config)), ConfigHandler(str(config))
+    first.presets, second.presets
+
+    del first.presets['a']
+    first.jsdata['regex_default'] = 'x'
+    first.dump()
+    second.presets['c'] = '3'
+    second.dump()
+
+    assert json.loads(config.read_text()) == {'regex_default': 'x', 'presets': {'b': '2', 'c': '3'}}
+    assert second.jsdata == json.loads(config.read_text())
+
+
+def test_statedir_defaults(tmp_path):
+    defaults = tmp_path / 'defaults.json'
+    defaults.write_text(json.dumps({'regex_default': 'x', 'presets': {'a': '1'}}))
+    statedir = tmp_path / 'state'
+    statedir.mkdir()
+    conf = ConfigHandler(str(statedir / 'config.json'), defaults=str(defaults), statedir=str(statedir))
+
+    assert conf.presets == {'a': '1'}
+    assert conf.journal_path('dir').startswith(str(statedir))
+    conf.presets['b'] = '2'
+    conf.dump()
+    assert json.loads((statedir / 'config.json').read_text())['presets'] == {'a': '1', 'b': '2'}
+    assert json.loads(defaults.read_text())['presets'] == {'a': '1'}
+
+
+def test_sqlite_size(tmp_path):
+    store = SQLiteHistory(str(tmp_path / 'history.sqlite3'))
+    size = store.size()
+    store.add_batch('dir', {f'dir/{index}b': f'dir/{index}a' for index in range(200)})
+    # the pages are still in the write-ahead log, not in the database file
+    assert store.size() > size
+
+
+def test_new_config_permissions(tmp_path):
+    umask = os.umask(0o022)
+    try:
+        statedir = tmp_path / 'state'
+        statedir.mkdir()
+        defaults = tmp_path / 'defaults.json'
+        defaults.write_text(json.dumps({'regex_default': '', 'presets': {}}))
+        conf = ConfigHandler(str(statedir / 'config.json'), defaults=str(defaults))
+        conf.presets['a'] = '1'
+        conf.dump()
+    finally:
+        os.umask(umask)
+    assert (statedir / 'config.json').stat().st_mode & 0o777 == 0o644
@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+from EZrename import Journal, rename
+
+NAMES = ['a1', 'b1', 'c1', 'd1', 'e1']
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.fixture()
+def interrupted(tmp_path):
+    """A batch of rename killed after its third rename, with a journal synced every 2 renames."""
+    for name in NAMES:
+        (tmp_path / name).write_text(name)
+    source = [(str(tmp_path / name), str(tmp_path / name[0])) for name in NAMES]
+    renamed = []
+
+    def on_rename(original, new_name):
+        renamed.append(new_name)
+        if len(renamed) == 3:
+            raise Interrupted
+
+    journal_file = str(tmp_path / 'journal' / 'batch.jsonl')
+    with pytest.raises(Interrupted):
+        with Journal(journal_file, str(tmp_path), group_size=2) as journal:
+            rename(source, on_rename=on_rename, journal=journal)
+
+    return tmp_path, journal_file
+
+
+def test_resume(interrupted):
+    tmp_path, journal_file = interrupted
+    journal, finished, pending = Journal.load(journal_file)
+    assert len(finished) == 2 and len(pending) == 2
+
+    history = Journal.resume(finished, pending)
+    journal.finish()
+
+    assert history == {str(tmp_path / name[0]): str(tmp_path / name) for name in NAMES[:4]}
+    assert sorted(os.listdir(tmp_path)) == ['a', 'b', 'c', 'd', 'e1', 'journal']
+    assert not os.path.exists(journal_file)
+
+
+def test_rollback(interrupted):
+    tmp_path, journal_file = interrupted
+    journal, finished, pending = Journal.load(journal_file)
+    Journal.rollback(finished + pending)
+
+    assert sorted(os.listdir(tmp_path)) == NAMES + ['journal']
+    assert all((tmp_path / name).read_text() == name for name in NAMES)
+
+
+def test_failed_before_renaming(tmp_path):
+    journal_file = str(tmp_path / 'journal' / 'batch.jsonl')
+
+    def source():
+        raise ValueError("bad pattern")
+        yield
+
+    with pytest.raises(ValueError):
+        with Journal(journal_file, str(tmp_path)) as journal:
+            rename(source(), on_rename=lambda original, new_name: None, journal=journal)
+    assert not os.path.exists(journal_file)
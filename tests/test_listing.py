@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+from EZrename import Listing, natural_key, get_files, renamed_files, rename
+
+
+def test_natural_key():
+    names = ['file10.txt', 'File2.txt', 'file1.txt', 'file02.txt', 'b', 'a10b2', 'a10b10', 'a9']
+    assert sorted(names, key=natural_key) == [
+        'a9', 'a10b2', 'a10b10', 'b', 'file1.txt', 'File2.txt', 'file02.txt', 'file10.txt'
+    ]
+
+
+def test_listing(tmp_path):
+    for name in ['file10', 'file2', 'file1']:
+        (tmp_path / name).write_text(name)
+    (tmp_path / 'sub').mkdir()
+    os.symlink(tmp_path / 'sub', tmp_path / 'link')
+
+    listing = Listing(str(tmp_path), natural=True)
+    assert len(listing) == 5
+    assert [entry.name for entry in listing] == ['file1', 'file2', 'file10', 'link', 'sub']
+    assert listing.name(2) == 'file10'
+
+    entry = listing[-2]
+    assert entry.path == os.path.join(str(tmp_path), 'link')
+    assert entry.is_symlink() and entry.is_dir() and not entry.is_dir(follow_symlinks=False)
+    assert listing[4].is_dir() and listing[0].is_file()
+    assert listing[0].inode() == os.stat(tmp_path / 'file1').st_ino
+    assert listing[2].stat().st_size == 6
+    with pytest.raises(IndexError):
+        listing[5]
+
+    entries = {entry.name: entry for entry in os.scandir(tmp_path)}
+    for listed in Listing(str(tmp_path)):
+        assert listed.is_dir() == entries[listed.name].is_dir()
+        assert listed.inode() == entries[listed.name].inode()
+
+
+def test_get_files_natural(tmp_path):
+    for number in [10, 2, 1, 33, 4]:
+        (tmp_path / f'file{number}.txt').write_text(str(number))
+    sub = tmp_path / 'sub'
+    sub.mkdir()
+    (sub / 'file3.txt').touch()
+
+    files = get_files(str(tmp_path), natural=True)
+    rename(renamed_files(str(tmp_path), files, r'^file\d+', '{n}'), on_rename=lambda original, new_name: None)
+    assert [(tmp_path / f'{n}.txt').read_text() for n in range(1, 6)] == ['1', '2', '4', '10', '33']
+
+    files = get_files(str(tmp_path), recursive=True, listing=True)
+    assert sorted(entry.name for entry in files) == ['1.txt', '2.txt', '3.txt', '4.txt', '5.txt', 'file3.txt', 'sub']
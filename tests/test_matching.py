@@ -0,0 +1,31 @@
+import re
+
+import pytest
+
+from EZrename.matching import Matcher, compile_matcher
+
+NAMES = ['[example] a.jpeg', 'IMG_IMG_1.jpeg', 'a.jpeg\n', 'exact', 'x$y', 'a\\b', '12 abc']
+
+@pytest.mark.parametrize('regex, kind, literal', [
+    (r'\[example\]', 'literal', '[example]'),
+    (r'^IMG_', 'prefix', 'IMG_'),
+    (r'\.jpeg$', 'suffix', '.jpeg'),
+    (r'\.jpeg\Z', 'suffix', '.jpeg'),
+    (r'\Aexact$', 'exact', 'exact'),
+    (r'x\$', 'literal', 'x$'),
+    (r'a\\', 'literal', 'a\\'),
+    (r'\d+', 'regex', None),
+    (r'(?i)abc', 'regex', None),
+    (r'ab{2}', 'regex', None),
+])
+def test_matcher(regex, kind, literal):
+    matcher = Matcher(regex)
+    assert (matcher.kind, matcher.literal) == (kind, literal)
+    for name in NAMES:
+        for repl in ['R', r'<\g<0>>', '', lambda match: 'Z']:
+            assert matcher.sub(repl, name) == re.sub(regex, repl, name)
+
+
+def test_compile_matcher_cache():
+    assert compile_matcher(r'\[example\]') is compile_matcher(r'\[example\]')
+    assert compile_matcher(re.compile('x', re.I)).kind == 'regex'
@@ -0,0 +1,46 @@
+import errno
+import os
+
+import pytest
+
+from EZrename import get_files, renamed_files, rename
+from EZrename.mover import move, copy_file
+
+def exdev(original, new_name):
+    raise OSError(errno.EXDEV, os.strerror(errno.EXDEV), original)
+
+
+def test_rename_dest(tmp_path):
+    source = tmp_path / 'source'
+    (source / 'sub').mkdir(parents=True)
+    (source / 'a1.txt').write_text('a')
+    (source / 'sub' / 'b1.txt').write_text('b')
+    dest = tmp_path / 'dest'
+    files = [entry for entry in get_files(source, recursive=True) if not entry.is_dir()]
+    history = rename(renamed_files(str(source), files, r'1', '', dest=str(dest)), on_rename=lambda *names: None, move=True)
+
+    assert dict(history.items()) == {
+        str(dest / 'a.txt'): str(source / 'a1.txt'),
+        str(dest / 'sub' / 'b.txt'): str(source / 'sub' / 'b1.txt'),
+    }
+    assert (dest / 'sub' / 'b.txt').read_text() == 'b'
+    assert os.listdir(source / 'sub') == []
+
+
+def test_move_across_devices(tmp_path):
+    (tmp_path / 'dir').mkdir()
+    (tmp_path / 'dir' / 'inner').write_text('inner')
+    (tmp_path / 'file').write_bytes(b'x' * 100000)
+    os.utime(tmp_path / 'file', (1, 1))
+
+    move(str(tmp_path / 'file'), str(tmp_path / 'new' / 'file'), rename=exdev)
+    move(str(tmp_path / 'dir'), str(tmp_path / 'new' / 'dir'), rename=exdev)
+    assert sorted(os.listdir(tmp_path)) == ['new']
+    assert (tmp_path / 'new' / 'file').read_bytes() == b'x' * 100000
+    assert (tmp_path / 'new' / 'file').stat().st_mtime == 1
+    assert (tmp_path / 'new' / 'dir' / 'inner').read_text() == 'inner'
+
+    (tmp_path / 'other').write_text('other')
+    with pytest.raises(FileExistsError):
+        copy_file(str(tmp_path / 'other'), str(tmp_path / 'new' / 'file'))
+    assert sorted(os.listdir(tmp_path / 'new')) == ['dir', 'file']
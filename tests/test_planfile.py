@@ -0,0 +1,61 @@
+import io
+import os
+
+import pytest
+
+from EZrename import get_files, renamed_files, rename, write_plan, read_plan
+
+def test_plan_roundtrip(tmp_path):
+    for name in ['a1', 'b1', 'c']:
+        (tmp_path / name).touch()
+    path = str(tmp_path)
+    source = sorted(renamed_files(path, get_files(path), r'1', ''))
+
+    fp = io.StringIO()
+    assert write_plan(fp, path, source) == 2
+    # names are stored relative to the directory
+    assert fp.getvalue().splitlines()[1:] == ['["a1", "a"]', '["b1", "b"]']
+
+    fp.seek(0)
+    planned_path, pairs = read_plan(fp)
+    assert planned_path == path
+    assert list(pairs) == source
+
+    fp.seek(0)
+    rename(read_plan(fp)[1], on_rename=lambda original, new_name: None)
+    assert sorted(os.listdir(tmp_path)) == ['a', 'b', 'c']
+
+
+def test_read_plan_rejects_other_files():
+    with pytest.raises(ValueError):
+        read_plan(io.StringIO('["a", "b"]\n'))
+
+
+def test_plan_from_another_directory(tmp_path, monkeypatch):
+    target = tmp_path / 'target'
+    target.mkdir()
+    (target / 'a1').touch()
+    monkeypatch.chdir(tmp_path)
+    fp = io.StringIO()
+    write_plan(fp, 'target', renamed_files('target', get_files('target'), r'1', ''))
+
+    monkeypatch.chdir(os.sep)
+    fp.seek(0)
+    planned_path, pairs = read_plan(fp)
+    assert planned_path == str(target)
+    rename(pairs, on_rename=lambda original, new_name: None)
+    assert os.listdir(target) == ['a']
+
+
+def test_plan_with_dest(tmp_path, monkeypatch):
+    target = tmp_path / 'target'
+    target.mkdir()
+    (target / 'a1').touch()
+    monkeypatch.chdir(tmp_path)
+    fp = io.StringIO()
+    write_plan(fp, 'target', renamed_files('target', get_files('target'), r'1', '', dest='out'))
+
+    monkeypatch.chdir(target)
+    fp.seek(0)
+    rename(read_plan(fp)[1], on_rename=lambda original, new_name: None, move=True)
+    assert os.listdir(tmp_path / 'out') == ['a'] and os.listdir(target) == []
@@ -1,8 +1,11 @@
 import os
+import pickle
 
 import pytest
 
-from EZrename import get_files, renamed_files, rename
+from EZrename import get_files, walk_files, renamed_files, rename, rename_waves, plan_renames, BatchResult
+from EZrename.snapshot import Snapshot
+from EZrename.stats import Stats
 from EZrename.__main__ import get_predicates
 
 DIR = ['dir1', 'dir2', 'dir3']
@@ -43,16 +46,36 @@ def test_get_files(testdir1, predicates, expected):
     assert output == sorted(expected)
 
 
+@pytest.mark.parametrize('max_depth, expected', [
+    (0, LIST_DIR),
+    (1, LIST_DIR + ['inner.txt', 'sub']),
+    (None, LIST_DIR + ['inner.txt', 'sub', 'deep.txt']),
+])
+def test_walk_files(testdir1, max_depth, expected):
+    (testdir1 / 'dir1' / 'sub').mkdir()
+    (testdir1 / 'dir1' / 'inner.txt').touch()
+    (testdir1 / 'dir1' / 'sub' / 'deep.txt').touch()
+
+    paths = [entry.path for entry in walk_files(testdir1, max_depth=max_depth, workers=2)]
+    assert sorted(os.path.basename(p) for p in paths) == sorted(expected)
+    # every entry comes before the directory containing it
+    for index, path in enumerate(paths):
+        parent = os.path.dirname(path)
+        if parent in paths:
+            assert index < paths.index(parent)
+
+
 renamed_files_parameters = [
     (r'\d+', 'LOL', [
         ('dir1', 'dirLOL'), ('dir2', 'dirLOL'), ('dir3', 'dirLOL'),
-        ('hello.mkv', 'hello.mkv'), ('hello2.mkv', 'helloLOL.mkv'), ('hello3.mp3', 'helloLOL.mpLOL')
+        ('hello2.mkv', 'helloLOL.mkv'), ('hello3.mp3', 'helloLOL.mpLOL')
     ]),
     (r'\d+', '', [
-        ('dir1', 'dir'), ('dir2', 'dir'), ('dir3', 'dir'), ('hello.mkv', 'hello.mkv'),
+        ('dir1', 'dir'), ('dir2', 'dir'), ('dir3', 'dir'),
         ('hello2.mkv', 'hello.mkv'), ('hello3.mp3', 'hello.mp')
     ]),
 ]
+# names which don't change, like hello.mkv, are left out
 @pytest.mark.parametrize('regex, replace_with, expected', renamed_files_parameters)
 def test_renamed_files(testdir1, regex, replace_with, expected):
     files = [
@@ -66,19 +89,216 @@ def test_renamed_files(testdir1, regex, replace_with, expected):
     assert output == expected
 
 
+def test_renamed_files_snapshot(testdir1, tmp_path):
+    snapshot = Snapshot(str(tmp_path / 'snapshot.sqlite3'), key='digits')
+    first = list(renamed_files(testdir1, get_files(testdir1), r'\d', ''))
+    assert snapshot.changes == 0
+    list(renamed_files(testdir1, get_files(testdir1), r'\d', '', snapshot=snapshot))
+    assert snapshot.changes == len(first)
+    snapshot.commit()
+
+    snapshot = Snapshot(str(tmp_path / 'snapshot.sqlite3'), key='digits')
+    # names without digits conform, so the regex isn't even run on them
+    assert list(renamed_files(testdir1, get_files(testdir1), r'\d', '', snapshot=snapshot)) == first
+    conforming = ['docu.docx', 'text.txt', 'hello.mkv']
+    assert snapshot.seen[str(testdir1)] == {
+        ((testdir1 / name).stat().st_ino, (testdir1 / name).stat().st_mtime_ns, (testdir1 / name).stat().st_size, name)
+        for name in conforming
+    }
+
+    assert not snapshot.unchanged(str(testdir1))
+    snapshot.mark(str(testdir1))
+    assert snapshot.unchanged(str(testdir1))
+    (testdir1 / 'new.txt').touch()
+    assert not snapshot.unchanged(str(testdir1))
+
+
+def test_renamed_files_snapshot_metadata(tmp_path):
+    (tmp_path / '5.txt').write_text('12345')
+    dbfile = str(tmp_path / 'snapshot.sqlite3')
+    snapshot = Snapshot(dbfile, key='size', metadata=True)
+    assert list(renamed_files(tmp_path, get_files(tmp_path), r'^\d+(?=\.txt$)', '{size}', snapshot=snapshot)) == []
+    snapshot.commit()
+    snapshot.mark(str(tmp_path))
+    assert not snapshot.unchanged(str(tmp_path))
+
+    # the name is the same, but it no longer conforms
+    with open(tmp_path / '5.txt', 'a') as fp:
+        fp.write('67890')
+    snapshot = Snapshot(dbfile, key='size', metadata=True)
+    assert list(renamed_files(tmp_path, get_files(tmp_path), r'^\d+(?=\.txt$)', '{size}', snapshot=snapshot)) == [
+        (str(tmp_path / '5.txt'), str(tmp_path / '10.txt'))
+    ]
+
+
 def test_rename(testdir1):
     predicates = [lambda e: e.is_dir() or e.name.endswith('.mkv') or e.name.endswith('.mp3')]
-    source = renamed_files(testdir1, get_files(testdir1, predicates), r'\d+', '')
-    output = rename(source)
+    files = sorted(get_files(testdir1, predicates), key=lambda e: e.name)
+    output = rename(renamed_files(testdir1, files, r'\d+', ''))
 
     after_rename = {
         'dir1': 'dir',
         'dir2': 'dir (1)',
         'dir3': 'dir (2)',
-        'hello.mkv': 'hello.mkv',
-        'hello2.mkv': 'hello (3).mkv',
+        'hello2.mkv': 'hello (1).mkv',
         'hello3.mp3': 'hello.mp',
     }
     expected = {str(testdir1/after): str(testdir1/before) for before, after in after_rename.items()}
 
     assert output == expected
+    assert sorted(os.listdir(testdir1)) == sorted(
+        ['dir', 'dir (1)', 'dir (2)', 'hello.mkv', 'hello (1).mkv', 'hello.mp'] + DOCX + TEXT
+    )
+
+
+def test_rename_scanned_names(tmp_path, monkeypatch):
+    for name in ['a.txt', 'a1.txt', 'b1.mkv']:
+        (tmp_path / name).touch()
+    names = {}
+    files = list(get_files(str(tmp_path), get_predicates(only=['txt']), names=names))
+    # filtered out entries are still names which can't be taken
+    assert names == {str(tmp_path): {'a.txt', 'a1.txt', 'b1.mkv'}}
+
+    def listdir(path):
+        raise AssertionError("the scanned directory was listed again")
+
+    monkeypatch.setattr(os, 'listdir', listdir)
+    output = rename(renamed_files(str(tmp_path), files, r'1', ''), on_rename=lambda *pair: None, names=names)
+    assert output == {str(tmp_path / 'a (1).txt'): str(tmp_path / 'a1.txt')}
+
+
+def test_rename_cycle(testdir1):
+    (testdir1 / 'text.txt').write_text('first')
+    (testdir1 / 'text2.txt').write_text('second')
+    swap = {'text.txt': 'text2.txt', 'text2.txt': 'text.txt', 'docu.docx': 'docu2.docx'}
+    source = [(str(testdir1/original), str(testdir1/new_name)) for original, new_name in swap.items()]
+    output = rename(source, on_rename=lambda original, new_name: None)
+
+    assert (testdir1 / 'text.txt').read_text() == 'second'
+    assert (testdir1 / 'text2.txt').read_text() == 'first'
+    assert output == {
+        str(testdir1/'text2.txt'): str(testdir1/'text.txt'),
+        str(testdir1/'text.txt'): str(testdir1/'text2.txt'),
+        # docu2.docx exists and isn't renamed, so it must not be overwritten
+        str(testdir1/'docu2 (1).docx'): str(testdir1/'docu.docx'),
+    }
+
+
+def test_rename_waves():
+    plan = [
+        ('top/a/x', 'top/a/y'), ('top/b', 'top/c'), ('top/d', 'top/b'),
+        ('top/a', 'top/e'), ('top/f', 'top/g'), ('top/e/y', 'top/e/z'),
+    ]
+    assert rename_waves(plan) == [
+        [('top/a/x', 'top/a/y'), ('top/b', 'top/c'), ('top/f', 'top/g')],
+        # b is freed in the first wave, a is renamed after its contents
+        [('top/d', 'top/b'), ('top/a', 'top/e')],
+        [('top/e/y', 'top/e/z')],
+    ]
+
+
+def test_rename_jobs(testdir1):
+    source = renamed_files(testdir1, sorted(get_files(testdir1), key=lambda e: e.name), r'\d+', '')
+    calls = []
+    output = rename(source, on_rename=lambda original, new_name: calls.append(new_name), jobs=4)
+
+    assert list(output) == calls
+    assert sorted(os.listdir(testdir1)) == sorted([
+        'dir', 'dir (1)', 'dir (2)', 'docu.docx', 'docu (1).docx', 'text.txt', 'text (1).txt',
+        'hello.mkv', 'hello (1).mkv', 'hello.mp'
+    ])
+
+
+def test_rename_stats(testdir1):
+    stats = Stats()
+    files = get_files(testdir1, stats=stats)
+    rename(renamed_files(testdir1, files, r'\d+', '', stats=stats), on_rename=lambda *names: None, stats=stats)
+
+    assert list(stats.phases) == ['plan', 'transform', 'scan', 'rename']
+    assert stats.counts == {'entries': 10, 'matches': 7, 'skips': 3, 'renames': 7}
+    assert sum(stats.latencies.values()) == 7
+
+
+@pytest.mark.skipif(os.rename not in os.supports_dir_fd, reason="needs dir_fd support")
+def test_rename_dir_handles(testdir1):
+    from EZrename.renamer import _DirHandles, _rename_at, _load_renameat2
+
+    with _DirHandles(size=1) as handles:
+        _rename_at(handles, str(testdir1/'text.txt'), str(testdir1/'dir1'/'text.txt'))
+        # only the last directory stays open
+        assert list(handles.handles) == [str(testdir1/'dir1')]
+        fd = handles.handles[str(testdir1/'dir1')][0]
+        # a renamed directory forgets its handle and the ones inside it
+        handles.forget(str(testdir1))
+        assert not handles.handles
+        with pytest.raises(OSError):
+            os.fstat(fd)
+
+        if _load_renameat2():
+            with pytest.raises(FileExistsError):
+                _rename_at(handles, str(testdir1/'docu.docx'), str(testdir1/'docu2.docx'))
+    assert os.listdir(testdir1/'dir1') == ['text.txt']
+    assert sorted(DOCX) == sorted(name for name in os.listdir(testdir1) if name.endswith('.docx'))
+
+
+def test_batch_result():
+    renames = [('top/sub/b', 'top/sub/a'), ('top/d', 'top/c'), ('/elsewhere/f', '/elsewhere/e')]
+    result = BatchResult(renames[:2])
+    # the base moves up from the directory of the first rename to contain the next ones
+    assert result.base == 'top'
+    result.add(*renames[2])
+    assert result.base == ''
+
+    assert list(result.items()) == renames
+    assert list(reversed(result.items())) == renames[::-1]
+    assert result['top/d'] == 'top/c'
+    assert 'top/a' not in result
+    assert result == dict(renames)
+    assert pickle.loads(pickle.dumps(result)) == dict(renames)
+
+
+def test_batch_result_hash_collisions(monkeypatch):
+    from EZrename import renamer
+
+    # every name shares a hash, so each lookup has to tell them apart
+    monkeypatch.setattr(renamer, 'hash', lambda name: 0, raising=False)
+    result = BatchResult([('d/b', 'd/a'), ('d/d', 'd/c')])
+    assert result['d/b'] == 'd/a' and result['d/d'] == 'd/c'
+    result.add('d/b', 'd/e')
+    result.add('d/f', 'd/g')
+    assert result['d/b'] == 'd/e' and result['d/f'] == 'd/g'
+    assert 'd/x' not in result
+
+
+def test_plan_renames_without_listing(tmp_path, monkeypatch):
+    for name in ['a.txt', 'a1.txt']:
+        (tmp_path / name).touch()
+    monkeypatch.setattr(os, 'listdir', lambda path: pytest.fail("the target directory was listed"))
+    plan = plan_renames([(str(tmp_path / 'a1.txt'), str(tmp_path / 'a.txt'))], list_targets=False)
+    assert plan == [(str(tmp_path / 'a1.txt'), str(tmp_path / 'a (1).txt'))]
+
+
+@pytest.mark.parametrize('replace_with', ['', '.', '..', 'sub/b'])
+def test_plan_renames_invalid_names(tmp_path, replace_with):
+    (tmp_path / 'a.txt').touch()
+    (tmp_path / 'sub').mkdir()
+    errors = []
+    plan = plan_renames(renamed_files(str(tmp_path), get_files(str(tmp_path)), r'^a\.txt$', replace_with),
+                        on_invalid=errors.append)
+    assert plan == []
+    assert [err.filename for err in errors] == [str(tmp_path / 'a.txt')]
+
+
+def test_rename_errors_are_reported(tmp_path):
+    (tmp_path / 'a1').touch()
+    errors = []
+    source = [
+        (str(tmp_path / 'a1'), str(tmp_path)),
+        (str(tmp_path / 'missing'), str(tmp_path / 'b')),
+        (str(tmp_path / 'a1'), str(tmp_path / 'a')),
+    ]
+    stats = Stats()
+    output = rename(source, on_rename=lambda *pair: None, on_permission_error=errors.append, stats=stats)
+    assert output == {str(tmp_path / 'a'): str(tmp_path / 'a1')}
+    assert [type(err) for err in errors] == [OSError, FileNotFoundError]
+    assert stats.counts['errors'] == 2
@@ -0,0 +1,20 @@
+import io
+
+from EZrename import get_files, renamed_files, rename, Reporter
+
+def test_reporter(tmp_path):
+    for name in ['a1', 'b1', 'c1', 'd']:
+        (tmp_path / name).touch()
+    changes, progress = io.StringIO(), io.StringIO()
+    with Reporter(changes=changes, progress=progress, summary=True, interval=60, block=2) as reporter:
+        rename(renamed_files(tmp_path, sorted(get_files(tmp_path), key=lambda e: e.name), r'1', ''),
+               **reporter.callbacks)
+        # the third change waits for the next block
+        assert changes.getvalue().count('\n') == 2
+
+    assert reporter.total == reporter.renamed == 3
+    assert changes.getvalue().splitlines() == [
+        f"{tmp_path / name}1 -> {tmp_path / name}" for name in 'abc'
+    ]
+    assert "Renamed 3, 0 error(s) in" in progress.getvalue()
+    assert "3/3 renamed" in progress.getvalue()
@@ -0,0 +1,77 @@
+import io
+import json
+import os
+
+import pytest
+
+from EZrename import JobRunner, JobError, load_manifest
+from EZrename.utils import ConfigHandler
+
+@pytest.fixture()
+def runner(tmp_path):
+    config = tmp_path / 'config.json'
+    config.write_text(json.dumps({'regex_default': '', 'last_changes': {}, 'presets': {'digits': r'\d+'}}))
+    return JobRunner(ConfigHandler(str(config)))
+
+
+def test_serve_lines(runner, tmp_path):
+    target = tmp_path / 'target'
+    target.mkdir()
+    for name in ['a1.txt', 'b2.txt', 'c3.mkv']:
+        (target / name).touch()
+    jobs = [
+        {'path': str(target), 'preset': 'digits', 'only': ['txt']},
+        {'path': str(target), 'regex': '3', 'replacewith': 'three'},
+        {'path': str(target), 'preset': 'missing'},
+    ]
+    output = io.StringIO()
+    runner.serve_lines(io.StringIO(''.join(json.dumps(job) + '\n' for job in jobs) + 'garbage\n'), output)
+    results = [json.loads(line) for line in output.getvalue().splitlines()]
+
+    assert [result['renamed'] for result in results] == [2, 1, 0, 0]
+    assert results[2]['error'] == "No preset exists by that name."
+    assert 'error' in results[3]
+    assert sorted(os.listdir(target)) == ['a.txt', 'b.txt', 'cthree.mkv']
+    assert runner.conf.history.count(str(target)) == 2
+    assert list(runner.patterns) == [r'\d+', '3']
+
+
+def test_run_many(runner, tmp_path):
+    targets = []
+    for number in range(4):
+        target = tmp_path / f'target{number}'
+        target.mkdir()
+        for name in ['a1.txt', 'b2.mkv']:
+            (target / name).touch()
+        targets.append(target)
+    manifest = tmp_path / 'manifest.toml'
+    manifest.write_text(
+        'preset = "digits"\n'
+        + ''.join(f'[[job]]\npath = "{target}"\nonly = ["txt"]\n' for target in targets[:2])
+        + f'[[job]]\npath = "{targets[2]}"\nregex = "2"\nreplacewith = "two"\n'
+        + f'[[job]]\npath = "{targets[2]}"\n'
+        + '[[job]]\npath = "missing"\n'
+        + '[[job]]\nregex = "a"\n'
+        + '[[job]]\npath = 1\n'
+        + f'[[job]]\npath = "{targets[3]}"\n'
+    )
+    jobs = load_manifest(str(manifest))
+    results = list(runner.run_many(jobs, workers=2))
+
+    assert [result['renamed'] for result in results] == [1, 1, 1, 1, 0, 0, 0, 2]
+    assert [result['path'] for result in results[:4]] == [str(target) for target in targets[:3]] + [str(targets[2])]
+    assert all('error' in result for result in results[4:7])
+    assert runner.conf.history.count(str(targets[3])) == 1
+    assert sorted(os.listdir(targets[0])) == ['a.txt', 'b2.mkv']
+    assert sorted(os.listdir(targets[2])) == ['a.txt', 'btwo.mkv']
+    assert runner.conf.history.count(str(targets[2])) == 2
+    assert not any(os.path.exists(runner.conf.journal_path(str(target))) for target in targets)
+
+
+def test_load_manifest_jsonl(tmp_path):
+    manifest = tmp_path / 'manifest.jsonl'
+    manifest.write_text('{"path": "a"}\n\n[1]\n')
+    with pytest.raises(JobError, match='manifest.jsonl:3'):
+        load_manifest(str(manifest))
+    manifest.write_text('{"path": "a"}\n\n{"path": "b", "regex": "x"}\n')
+    assert load_manifest(str(manifest)) == [{'path': 'a'}, {'path': 'b', 'regex': 'x'}]
@@ -0,0 +1,25 @@
+import os
+import time
+
+from EZrename import get_files, renamed_files, Template
+
+def test_template(tmp_path):
+    for name in ['a.txt', 'b.txt', 'c.mkv']:
+        (tmp_path / name).write_bytes(b'x' * 10)
+    os.utime(tmp_path / 'a.txt', (0, time.mktime((2021, 1, 31, 12, 0, 0, 0, 0, -1))))
+    template = Template(r'{parent}_{n:03d}_{size}{{\1}}_{mtime:%Y%m%d}')
+    files = sorted(get_files(tmp_path), key=lambda entry: entry.name)
+    output = [os.path.basename(new_name) for original, new_name in renamed_files(tmp_path, files, r'^(\w)(?=\.txt)', template)]
+
+    parent = tmp_path.name
+    today = time.strftime('%Y%m%d')
+    # c.mkv doesn't match, so it doesn't count
+    assert output == [f'{parent}_001_10{{a}}_20210131.txt', f'{parent}_002_10{{b}}_{today}.txt']
+    assert template.count == 2
+    assert template.tokens == {'parent', 'n', 'size', 'mtime'}
+
+
+def test_template_static():
+    template = Template(r'{unknown} \1')
+    assert template.static and not template.tokens
+    assert template.replacement(None) == r'{unknown} \1'
@@ -0,0 +1,29 @@
+import os
+import threading
+
+import pytest
+
+from EZrename import Watcher, renamed_files, rename
+
+@pytest.mark.parametrize('poll', [False, True])
+def test_watcher(tmp_path, poll):
+    (tmp_path / 'old1.txt').touch()
+    with Watcher(str(tmp_path), delay=0.2, interval=0.1, poll=poll) as watcher:
+        batches = watcher.batches()
+
+        def arrive():
+            # writing into an entry which was already there doesn't make it an arrival
+            with open(tmp_path / 'old1.txt', 'a') as fp:
+                fp.write('old')
+            (tmp_path / 'new1.txt').write_text('new')
+            (tmp_path / 'dir1').mkdir()
+        threading.Timer(0.1, arrive).start()
+        batch = next(batches)
+        assert sorted((arrival.name, arrival.is_dir()) for arrival in batch) == [('dir1', True), ('new1.txt', False)]
+
+        watcher.renamed(rename(renamed_files(str(tmp_path), batch, r'1', '2'), on_rename=lambda *names: None))
+        threading.Timer(0.1, (tmp_path / 'last1.txt').touch).start()
+        # the renames of the previous batch aren't arrivals
+        assert [arrival.name for arrival in next(batches)] == ['last1.txt']
+
+    assert sorted(os.listdir(tmp_path)) == ['dir2', 'last1.txt', 'new2.txt', 'old1.txt']